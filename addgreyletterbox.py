@@ -1,48 +1,141 @@
-import torch
-
-class AddGreyLetterbox:
-    @classmethod
-    def INPUT_TYPES(cls):
-        return {
-            "required": {
-                "images": ("IMAGE", {"tooltip": "Input single image or batch of images."}),
-                "grey_value": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "Grey level for the letterbox, default is 50%."}),
-            }
-        }
-
-    RETURN_TYPES = ("IMAGE",)
-    FUNCTION = "add_letterbox"
-
-    CATEGORY = "image/transform"
-
-    def add_letterbox(self, images, grey_value=0.5):
-        # Handle single image by adding batch dimension
-        if len(images.shape) == 3:
-            images = images.unsqueeze(0)
-
-        batch, height, width, channels = images.shape
-        max_dim = max(height, width)
-
-        padded_images = []
-        for img in images:
-            # Determine padding
-            padding_top = (max_dim - img.shape[0]) // 2
-            padding_bottom = max_dim - img.shape[0] - padding_top
-            padding_left = (max_dim - img.shape[1]) // 2
-            padding_right = max_dim - img.shape[1] - padding_left
-
-            # Add grey padding
-            padded_img = torch.nn.functional.pad(
-                img,
-                (0, 0, padding_left, padding_right, padding_top, padding_bottom),
-                mode="constant",
-                value=grey_value,
-            )
-            padded_images.append(padded_img)
-
-        # Stack into a batch
-        return (torch.stack(padded_images),)
-
-NODE_CLASS_MAPPINGS = {
-        "Add Grey Letterbox": AddGreyLetterbox
-}
+import torch
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_instrumentation as instrumentation
+import stable_cascade_paths
+
+# Reduced-precision storage for the letterbox output, for the Python API only: IMAGE
+# outputs stay float32, since SaveImage, PreviewImage and most nodes convert them to numpy,
+# which has no bf16. Padding is an exact copy, so the only error is the cast of each pixel
+# value in [0, 1]:
+#   fp16  <= 2.5e-4  (11-bit significand)
+#   bf16  <= 2.0e-3  (8-bit significand)
+#   uint8 <= 2.0e-3  (1/510, values scaled to 0-255)
+PRECISION_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16, "uint8": torch.uint8}
+
+class AddGreyLetterbox:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE", {"tooltip": "Input single image, batch of images or a list of differently sized batches."}),
+                "grey_value": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "Grey level for the letterbox, default is 50%."}),
+            },
+            "optional": {
+                "output_path": ("STRING", {"default": "", "tooltip": "If set, the letterboxed batch is written to a memory-mapped file at this path in the ComfyUI output directory instead of RAM."}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "add_letterbox"
+    # Receive every connected batch separately so differently sized images can be combined
+    INPUT_IS_LIST = True
+
+    CATEGORY = "image/transform"
+
+    def add_letterbox(self, images, grey_value=0.5, output_path="", precision="auto"):
+        """Letterbox images into one square batch; precision is one of PRECISION_DTYPES or auto."""
+        timer = instrumentation.start(type(self).__name__)
+
+        # With INPUT_IS_LIST the widgets arrive as one-element lists too
+        if isinstance(grey_value, list):
+            grey_value = grey_value[0]
+        if isinstance(output_path, list):
+            output_path = output_path[0]
+        if output_path:
+            output_path = stable_cascade_paths.confined_path(output_path, "output")
+
+        # Handle a single batch or image passed directly
+        if torch.is_tensor(images):
+            images = [images]
+
+        # Compute the common square once across every input size
+        max_dim = letterbox_size(images)
+        batch = sum(1 if len(img.shape) == 3 else img.shape[0] for img in images)
+        channels = images[0].shape[-1]
+        dtype = PRECISION_DTYPES.get(precision, images[0].dtype)
+        timer.mark("planning")
+
+        # Fill the whole output once and copy every frame into its centered window,
+        # so no padded intermediate is ever created per frame
+        output = allocate_letterbox((batch, max_dim, max_dim, channels), grey_value, dtype, output_path)
+        timer.mark("allocation")
+        for index, img in enumerate(iter_frames(images)):
+            paste_centered(output[index], img)
+        timer.mark("copy")
+        timer.finish(output)
+
+        return (output,)
+
+
+def letterbox_size(images):
+    """Side of the square every frame in images fits in.
+
+    images can be an IMAGE batch, a single [H, W, C] frame or a list of either with
+    differing sizes.
+    """
+    if torch.is_tensor(images):
+        return max(images.shape[-3], images.shape[-2])
+    return max(letterbox_size(img) for img in images)
+
+def iter_frames(images):
+    # Iterating a batch yields views, so frames are never copied here
+    if torch.is_tensor(images):
+        images = [images]
+    for batch in images:
+        if len(batch.shape) == 3:
+            yield batch
+        else:
+            yield from batch
+
+def paste_centered(target, img):
+    # Determine padding
+    padding_top = (target.shape[0] - img.shape[0]) // 2
+    padding_left = (target.shape[1] - img.shape[1]) // 2
+
+    # Floating point targets cast on assignment; uint8 needs the values scaled first
+    if target.dtype == torch.uint8 and img.dtype != torch.uint8:
+        img = (img * 255).round_().clamp_(0, 255)
+
+    target[padding_top:padding_top + img.shape[0], padding_left:padding_left + img.shape[1]] = img
+
+def fill_value(grey_value, dtype):
+    return round(grey_value * 255) if dtype == torch.uint8 else grey_value
+
+def allocate_letterbox(shape, grey_value, dtype, output_path=""):
+    if output_path:
+        numel = shape[0] * shape[1] * shape[2] * shape[3]
+        output = torch.from_file(output_path, shared=True, size=numel, dtype=dtype).view(shape)
+        return output.fill_(fill_value(grey_value, dtype))
+    return torch.full(shape, fill_value(grey_value, dtype), dtype=dtype)
+
+def iter_letterbox(images, grey_value=0.5, chunk_size=16, size=None, dtype=None):
+    """Yield letterboxed chunks of at most chunk_size frames.
+
+    Only one chunk is materialised at a time, so arbitrarily long batches or lists of
+    differently sized frames can be streamed. size defaults to the largest side across
+    all inputs; pass it explicitly when images is a one-shot iterator. dtype selects a
+    reduced-precision wire format (see PRECISION_DTYPES), defaulting to the input type.
+    """
+    if size is None:
+        size = letterbox_size(images)
+
+    chunk = []
+    for img in iter_frames(images):
+        chunk.append(img)
+        if len(chunk) == chunk_size:
+            yield letterbox_chunk(chunk, grey_value, size, dtype)
+            chunk = []
+    if chunk:
+        yield letterbox_chunk(chunk, grey_value, size, dtype)
+
+def letterbox_chunk(frames, grey_value, size, dtype=None):
+    output = allocate_letterbox((len(frames), size, size, frames[0].shape[-1]), grey_value, dtype or frames[0].dtype)
+    for index, img in enumerate(frames):
+        paste_centered(output[index], img)
+    return output
+
+NODE_CLASS_MAPPINGS = {
+        "Add Grey Letterbox": AddGreyLetterbox
+}
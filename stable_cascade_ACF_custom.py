@@ -0,0 +1,31 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_latents
+import stable_cascade_LatentPlanner
+
+class SC_EmptyLatentImageACF_custom(stable_cascade_LatentPlanner.LegacyLatentNode):
+    STRATEGY = "acf_custom"
+    ARGUMENTS = ("batch_size", "center_min", "center_max", "aspect_max", "compression_max", "method")
+
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {
+            "width": ("INT", {"default": 1024, "min": 256, "max": 4096, "step": 32}),
+            "height": ("INT", {"default": 1024, "min": 256, "max": 4096, "step": 32}),
+            "batch_size": ("INT", {"default": 1, "min": 1, "max": 4096}),
+            "center_min": ("FLOAT", {"default": 32, "min": 1, "max": 128, "step": 0.125, "tooltip": "Stage C latent mean aimed for with square images."}),
+            "center_max": ("FLOAT", {"default": 38.5, "min": 1, "max": 128, "step": 0.125, "tooltip": "Stage C latent mean aimed for at aspect_max and beyond."}),
+            "aspect_max": ("FLOAT", {"default": 3.75, "min": 1.01, "max": 16, "step": 0.01}),
+            "compression_max": ("INT", {"default": 128, "min": 16, "max": 512, "tooltip": "Highest compression factor tried, down to 16."}),
+            "method": (["plus", "min", "alt"], {"default": "plus"}),
+        }, "optional": {
+            **stable_cascade_latents.MEMORY_INPUTS,
+            **stable_cascade_latents.NOISE_INPUTS,
+            **stable_cascade_latents.SHARD_INPUTS,
+        }}
+
+
+NODE_CLASS_MAPPINGS = {
+    "SC_EmptyLatentImageACF_custom": SC_EmptyLatentImageACF_custom,
+}
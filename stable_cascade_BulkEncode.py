@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import numpy as np
+import torch
+import comfy.utils
+import sys
+from PIL import Image, ImageOps
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_instrumentation as instrumentation
+import stable_cascade_paths
+import stable_cascade_planner
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+INDEX_NAME = "index.json"
+
+class AutoResonanceBulkEncode:
+    def __init__(self, device="cpu"):
+        self.device = device
+
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {
+            "vae": ("VAE", {"tooltip": "The Stage C encoder, downscale_ratio 32."}),
+            "input_dir": ("STRING", {"default": "", "tooltip": "Directory of images to encode, in the ComfyUI input directory."}),
+            "output_dir": ("STRING", {"default": "", "tooltip": "Directory the latent shards and index.json are written to, in the ComfyUI output directory."}),
+            "offset": ("INT", {"default": 0, "min": -16, "max": 16}),
+            "shard_size_mb": ("INT", {"default": 1024, "min": 1, "max": 65536, "tooltip": "Start a new shard file once the current one reaches this size."}),
+            "resume": ("BOOLEAN", {"default": True, "tooltip": "Skip images already recorded in an existing index."}),
+        }}
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("index_path",)
+    FUNCTION = "encode_node"
+    OUTPUT_NODE = True
+
+    CATEGORY = "latent/stable_cascade"
+
+    def plan(self, image_width, image_height, offset=0):
+        # Same planning as the image branch of AutoResonanceAdvanced
+        plan = stable_cascade_planner.plan_dimensions("AutoResonanceAdvanced", image_width, image_height, offset=offset)
+        return plan["c_width"], plan["c_height"]
+
+    def encode_image(self, image, vae, offset=0):
+        timer = instrumentation.start(type(self).__name__)
+        image_width = image.shape[-2]
+        image_height = image.shape[-3]
+        c_width, c_height = self.plan(image_width, image_height, offset)
+        timer.mark("planning")
+
+        # Resize the image to match the best matching latent size using comfy.utils
+        image_tensor = image.movedim(-1, 1)  # Move the channel dimension
+        resized_image = comfy.utils.common_upscale(image_tensor, c_width * vae.downscale_ratio, c_height * vae.downscale_ratio, "bicubic", "center").movedim(1, -1)
+        timer.mark("resize")
+
+        c_latent = vae.encode(resized_image[:, :, :, :3])
+        timer.mark("encode")
+        timer.finish(c_latent)
+        return c_latent
+
+    def encode_node(self, vae, input_dir, output_dir, offset=0, shard_size_mb=1024, resume=True):
+        # A prompt may only read the input directory and write the output directory
+        input_dir = stable_cascade_paths.confined_path(input_dir, "input")
+        output_dir = stable_cascade_paths.confined_path(output_dir, "output")
+        return self.bulk_encode(vae, input_dir, output_dir, offset, shard_size_mb, resume)
+
+    def bulk_encode(self, vae, input_dir, output_dir, offset=0, shard_size_mb=1024, resume=True):
+        # A Stage A VAE encodes fine too, into latents Stage C cannot use
+        if vae.downscale_ratio != 32:
+            raise ValueError(f"Stage C latents need the Stage C encoder with downscale_ratio 32, got a VAE with downscale_ratio {vae.downscale_ratio}")
+        writer = ShardWriter(output_dir, shard_size_mb * 1024 * 1024, resume)
+        names = list_images(input_dir)
+        encoded = 0
+
+        try:
+            for name in names:
+                if writer.contains(name):
+                    continue
+
+                image = load_image(os.path.join(input_dir, name))
+                c_latent = self.encode_image(image, vae, offset)
+                writer.add(name, c_latent, (image.shape[-2], image.shape[-3]))
+                encoded += 1
+                print(f"Encoded {name} to Stage C latent {tuple(c_latent.shape)}")
+        finally:
+            writer.close()
+
+        print(f"Bulk encode finished: {encoded} encoded, {len(names) - encoded} skipped, index at {writer.index_path}")
+        return (writer.index_path,)
+
+
+class ShardWriter:
+    """Appends latents to fixed-size raw float32 shard files and keeps index.json in sync.
+
+    The index is the source of truth: on resume every shard is truncated back to the
+    size the index recorded, so a latent half-written before an interruption is dropped
+    and its image is encoded again.
+    """
+
+    def __init__(self, output_dir, shard_size, resume=True, index_every=64):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.index_every = index_every
+        self.index_path = os.path.join(output_dir, INDEX_NAME)
+        self.pending = 0
+        self.handle = None
+
+        if resume and os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+            for shard, size in self.index["shards"].items():
+                with open(os.path.join(output_dir, shard), "r+b") as f:
+                    f.truncate(size)
+        else:
+            self.index = {"version": 1, "dtype": "float32", "shards": {}, "entries": {}}
+
+    def contains(self, name):
+        return name in self.index["entries"]
+
+    def _current_shard(self, nbytes):
+        shards = self.index["shards"]
+        if shards:
+            shard = sorted(shards)[-1]
+            if shards[shard] == 0 or shards[shard] + nbytes <= self.shard_size:
+                return shard
+        shard = f"shard_{len(shards):05d}.bin"
+        shards[shard] = 0
+        # Drop anything an interrupted run wrote to this shard before it was indexed
+        open(os.path.join(self.output_dir, shard), "wb").close()
+        return shard
+
+    def add(self, name, latent, source_size):
+        data = latent.detach().to("cpu", torch.float32).contiguous().numpy().tobytes()
+        shard = self._current_shard(len(data))
+
+        if self.handle is None or self.handle.name != os.path.join(self.output_dir, shard):
+            if self.handle is not None:
+                self.handle.close()
+            self.handle = open(os.path.join(self.output_dir, shard), "ab")
+
+        offset = self.index["shards"][shard]
+        self.handle.write(data)
+        self.index["shards"][shard] = offset + len(data)
+        self.index["entries"][name] = {
+            "shard": shard,
+            "offset": offset,
+            "shape": list(latent.shape),
+            "source_size": list(source_size),
+        }
+
+        self.pending += 1
+        if self.pending >= self.index_every:
+            self.flush()
+
+    def flush(self):
+        if self.handle is not None:
+            self.handle.flush()
+            os.fsync(self.handle.fileno())
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path)
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+class LatentShardReader:
+    """Zero-copy access to latents written by AutoResonanceBulkEncode.
+
+    Each shard is memory-mapped once with torch.from_file and every latent is returned
+    as a view into that mapping, so loading does not read or copy the data up front.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        with open(os.path.join(output_dir, INDEX_NAME), "r") as f:
+            self.index = json.load(f)
+        self.mapped = {}
+
+    def names(self):
+        return list(self.index["entries"])
+
+    def _shard(self, shard):
+        if shard not in self.mapped:
+            size = self.index["shards"][shard] // 4
+            self.mapped[shard] = torch.from_file(os.path.join(self.output_dir, shard), shared=False, size=size, dtype=torch.float32)
+        return self.mapped[shard]
+
+    def load(self, name):
+        entry = self.index["entries"][name]
+        numel = int(np.prod(entry["shape"]))
+        data = self._shard(entry["shard"]).narrow(0, entry["offset"] // 4, numel)
+        return {"samples": data.view(entry["shape"])}
+
+
+def list_images(input_dir):
+    return sorted(name for name in os.listdir(input_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+
+def load_image(path):
+    # Same conversion as ComfyUI's LoadImage: RGB float32 in [0, 1], shape [1, H, W, C]
+    image = ImageOps.exif_transpose(Image.open(path)).convert("RGB")
+    return torch.from_numpy(np.array(image).astype(np.float32) / 255.0)[None,]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-encode a directory of images into sharded Stage C latents.")
+    parser.add_argument("--vae", required=True, help="Path to the Stage C encoder checkpoint (the VAE with downscale_ratio 32, not the Stage A VAE).")
+    parser.add_argument("--input-dir", required=True)
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--shard-size-mb", type=int, default=1024)
+    parser.add_argument("--no-resume", action="store_true")
+    args = parser.parse_args()
+
+    # Needs ComfyUI importable, e.g. run from the ComfyUI root with PYTHONPATH=.
+    import comfy.sd
+    vae = comfy.sd.VAE(sd=comfy.utils.load_torch_file(args.vae))
+
+    AutoResonanceBulkEncode().bulk_encode(vae, args.input_dir, args.output_dir, args.offset, args.shard_size_mb, not args.no_resume)
+
+NODE_CLASS_MAPPINGS = {
+    "AutoResonanceBulkEncode": AutoResonanceBulkEncode,
+}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_instrumentation as instrumentation
+import stable_cascade_planner
+import stable_cascade_latents
+import stable_cascade_costs
+import stable_cascade_vae
+
+class SC_LatentPlanner:
+    """Every Stable Cascade latent node in one, with the planning picked by strategy.
+
+    Each strategy plans exactly like the legacy node it is named after, through the same
+    shared planner tables, so switching strategy is a widget change instead of a rewire.
+    Inputs a strategy does not use are ignored. The legacy nodes are LegacyLatentNode
+    subclasses with the strategy fixed, so existing workflows keep working on this one
+    implementation. The auto strategy scores the plans of every strategy with the
+    *_weight inputs and picks the cheapest, see stable_cascade_planner.score_plans().
+
+    With init zeros the empty latents of every chunk are views of one zero tensor the size
+    of the largest chunk (see stable_cascade_latents.latent_list()), so writing into one
+    chunk in place changes them all; clone a chunk before modifying it.
+    """
+
+    def __init__(self, device="cpu"):
+        self.device = device
+
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {
+            "strategy": (["auto"] + list(stable_cascade_planner.STRATEGIES), {"default": "autoresonance_advanced", "tooltip": "Planning of the legacy node of the same name. The _vae strategies plan from the encoded image. auto picks the strategy with the lowest weighted cost."}),
+            "width": ("INT", {"default": 1024, "min": 256, "max": 4096, "step": 32}),
+            "height": ("INT", {"default": 1024, "min": 256, "max": 4096, "step": 32}),
+            "batch_size": ("INT", {"default": 1, "min": 1, "max": 4096}),
+        }, "optional": {
+            "offset": ("INT", {"default": 0, "min": -16, "max": 16, "tooltip": "Added to the Stage C size by the advanced and _vae strategies."}),
+            "pad_shortest_to_32": ("BOOLEAN", {"default": False, "tooltip": "_vae strategies only."}),
+            "target_mean": ("BOOLEAN", {"default": False, "tooltip": "_vae strategies only."}),
+            "mean": ("FLOAT", {"default": 32, "min": 1, "max": 64, "step": 0.5, "tooltip": "Stage C mean of target_mean in the _vae strategies, and the mean the auto costs are measured against."}),
+            "aspect_weight": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 100.0, "step": 0.01, "tooltip": "auto only. Cost of the log aspect error of Stage C."}),
+            "compute_weight": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 100.0, "step": 0.01, "tooltip": "auto only. Cost of the Stage C token count, relative to a mean x mean latent."}),
+            "mean_weight": ("FLOAT", {"default": 0.25, "min": 0.0, "max": 100.0, "step": 0.01, "tooltip": "auto only. Cost of the distance of the Stage C mean side to mean, relative to mean."}),
+            "center_min": ("FLOAT", {"default": 32, "min": 1, "max": 128, "step": 0.125, "tooltip": "acf_custom only. Stage C latent mean aimed for with square images."}),
+            "center_max": ("FLOAT", {"default": 38.5, "min": 1, "max": 128, "step": 0.125, "tooltip": "acf_custom only. Stage C latent mean aimed for at aspect_max and beyond."}),
+            "aspect_max": ("FLOAT", {"default": 3.75, "min": 1.01, "max": 16, "step": 0.01, "tooltip": "acf_custom only."}),
+            "compression_max": ("INT", {"default": 128, "min": 16, "max": 512, "tooltip": "acf_custom only. Highest compression factor tried, down to 16."}),
+            "method": (["plus", "min", "alt"], {"default": "plus", "tooltip": "acf_custom only."}),
+            "image": ("IMAGE", {}),
+            "vae": ("VAE", {}),
+            "fit_mode": (stable_cascade_vae.FIT_MODES, {"default": "match_image", "tooltip": "match_image plans the latent from the image. The other modes plan from width and height and crop, letterbox or stretch the image to fit."}),
+            "letterbox_grey": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "Grey level of the letterbox fit modes."}),
+            "resize_method": (stable_cascade_vae.RESIZE_METHODS, {"default": "bicubic", "tooltip": "Resampler for the image resize. The _aa variants, area and lanczos antialias and pre-shrink large downscales by pooling."}),
+            "resize_precision": (["fp32", "fp16", "bf16"], {"default": "fp32", "tooltip": "Precision of the image resize before encoding. fp16/bf16 halve memory bandwidth."}),
+            "encode_workers": ("INT", {"default": 1, "min": 1, "max": 64, "tooltip": "Encode the image batch in parallel on up to this many GPUs, with a VAE replica on each. A single device encodes the whole batch with the VAE itself."}),
+            **stable_cascade_latents.MEMORY_INPUTS,
+            **stable_cascade_latents.NOISE_INPUTS,
+            **stable_cascade_latents.SHARD_INPUTS,
+        }}
+
+    RETURN_TYPES = ("LATENT", "LATENT", "STRING", "FLOAT")
+    RETURN_NAMES = ("stage_c", "stage_b", "strategy", "score")
+    OUTPUT_IS_LIST = (True, True, False, False)
+    FUNCTION = "generate"
+
+    CATEGORY = "latent/stable_cascade"
+
+    def plan(self, strategy, width, height, image_size=None, weights=None, **options):
+        """(strategy, plan, score) for a request, resolving auto to the cheapest strategy."""
+        if strategy == "auto":
+            score, strategy, plan = stable_cascade_planner.score_plans(width, height, weights, image_size=image_size, **options)[0]
+            return strategy, plan, score
+
+        plan = stable_cascade_planner.plan_strategy(strategy, width, height, image_size, **options)
+        # Scores are measured against the size actually planned for
+        planned_width, planned_height = image_size or (width, height)
+        return strategy, plan, stable_cascade_planner.score_plan(plan, planned_width, planned_height, weights, options.get("mean", 32))
+
+    @instrumentation.profiled
+    def generate(self, strategy, width, height, batch_size=1, **inputs):
+        return self.plan_latents(strategy, width, height, batch_size, **inputs)
+
+    def plan_latents(self, strategy, width, height, batch_size=1, offset=0, pad_shortest_to_32=False, target_mean=False, mean=32, aspect_weight=1.0, compute_weight=0.0, mean_weight=0.25, center_min=32, center_max=38.5, aspect_max=3.75, compression_max=128, method="plus", image=None, vae=None, fit_mode="match_image", letterbox_grey=0.5, resize_method="bicubic", resize_precision="fp32", encode_workers=1, memory_limit="off", max_memory_mb=8192, chunk_size=0, init="zeros", seed=0, shard_index=0, shard_count=1):
+        timer = instrumentation.start(type(self).__name__)
+
+        encode = image is not None and vae is not None
+        image_size = (image.shape[-2], image.shape[-3]) if encode and fit_mode == "match_image" else None
+        weights = {"aspect": aspect_weight, "compute": compute_weight, "mean": mean_weight}
+        strategy, plan, score = self.plan(strategy, width, height, image_size, weights, offset=offset, pad_shortest_to_32=pad_shortest_to_32, target_mean=target_mean, mean=mean,
+                         center_min=center_min, center_max=center_max, aspect_max=aspect_max, compression_max=compression_max, method=method)
+        c_width, c_height = plan["c_width"], plan["c_height"]
+
+        print(f"Strategy {strategy} (score {score:.4f}): Compression factor set to: {plan['compression']}, Gap was: {plan['gap']}")
+        print(f"Stage C latent dimensions set to: {c_width}x{c_height}")
+        for warning in plan["warnings"]:
+            print(warning)
+        shard_start, shard_size = stable_cascade_latents.shard_range(batch_size, shard_index, shard_count)
+        batch_sizes = stable_cascade_latents.plan_batches(plan, shard_size, chunk_size, memory_limit, max_memory_mb)
+        timer.mark("planning")
+
+        if encode and shard_count > 1:
+            # Encode only this shard's images, split the same way as the empty latents
+            image_start, image_count = stable_cascade_latents.shard_range(image.shape[0], shard_index, shard_count)
+            image = image[image_start:image_start + image_count]
+
+        if encode and fit_mode == "latent_letterbox":
+            c_latent = stable_cascade_vae.encode_letterboxed(vae, image[:, :, :, :3], c_width, c_height, letterbox_grey, resize_method, resize_precision, encode_workers)
+            c_latents = stable_cascade_latents.split_latents(c_latent, batch_sizes, chunk_size > 0)
+            timer.mark("encode")
+        elif encode:
+            resized_image = stable_cascade_vae.resize(image, c_width * vae.downscale_ratio, c_height * vae.downscale_ratio, resize_method, resize_precision, fit_mode, letterbox_grey)
+            timer.mark("resize")
+            c_latent = stable_cascade_vae.encode(vae, resized_image[:, :, :, :3], encode_workers)
+            c_latents = stable_cascade_latents.split_latents(c_latent, batch_sizes, chunk_size > 0)
+            timer.mark("encode")
+        else:
+            c_latent, c_latents = stable_cascade_latents.initial_latents(batch_sizes, 16, c_height, c_width, "stage_c", init, seed, shard_start)
+
+        print(f"Stage B latent dimensions set to: {plan['b_width']}x{plan['b_height']}")
+
+        b_latent, b_latents = stable_cascade_latents.initial_latents(batch_sizes, 4, plan["b_height"], plan["b_width"], "stage_b", init, seed, shard_start)
+        timer.mark("allocation")
+        timer.finish(c_latent, b_latent)
+
+        c_latents, b_latents = stable_cascade_costs.attach(plan, c_latents, b_latents)
+        return (c_latents, b_latents, strategy, score)
+
+
+class LegacyLatentNode(SC_LatentPlanner):
+    """Base of the per-strategy nodes: SC_LatentPlanner with STRATEGY fixed.
+
+    Subclasses only declare their STRATEGY, their original INPUT_TYPES, and in ARGUMENTS
+    the order of their original generate() parameters after width and height, so Python
+    callers can still pass them positionally. Unlike the original nodes, which returned one
+    LATENT dict per stage, generate() returns (stage_c, stage_b) lists of LATENT dicts,
+    even for an unchunked and unsharded batch, so Python callers take entry 0 of each.
+    Workflows are unaffected, ComfyUI hands downstream nodes the entries one by one.
+    """
+
+    STRATEGY = None
+    ARGUMENTS = ("batch_size",)
+
+    RETURN_TYPES = ("LATENT", "LATENT")
+    RETURN_NAMES = ("stage_c", "stage_b")
+    OUTPUT_IS_LIST = (True, True)
+
+    @instrumentation.profiled
+    def generate(self, width, height, *args, **inputs):
+        inputs.update(zip(self.ARGUMENTS, args))
+        c_latents, b_latents, strategy, score = self.plan_latents(self.STRATEGY, width, height, **inputs)
+        return (c_latents, b_latents)
+
+
+NODE_CLASS_MAPPINGS = {
+    "SC_LatentPlanner": SC_LatentPlanner,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "SC_LatentPlanner": "Stable Cascade Latent Planner",
+}
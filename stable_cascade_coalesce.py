@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+import torch
+import comfy.model_management
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_planner
+import stable_cascade_latents
+import stable_cascade_costs
+
+# Request coalescing for API deployments that create empty latents outside the graph:
+# concurrent requests that plan to the same Stage C and Stage B shapes share one batched
+# allocation, so downstream sampling can run them as one batch. Everything here runs on
+# one event loop; call it from the loop that serves the requests.
+#
+# Outside a running ComfyUI this needs comfy importable, e.g. from the ComfyUI root:
+#   PYTHONPATH=. python custom_nodes/<this directory>/stable_cascade_coalesce.py --requests 500
+
+class LatentGroup:
+    """Requests waiting to be allocated as one batch."""
+
+    def __init__(self, group_id, plan, init, future):
+        self.group_id = group_id
+        self.plan = plan
+        self.init = init
+        self.future = future
+        self.requests = []
+        self.size = 0
+        self.timer = None
+
+
+class LatentCoalescer:
+    """Groups concurrent empty-latent requests with identical planned shapes into one batch.
+
+    request() plans the latent like the node it names, then waits up to window seconds for
+    other requests that plan to the same (stage_c, stage_b) shapes with the same init.
+    The group is allocated as a single batch once the window closes or it reaches
+    max_batch samples, and every request gets views of its own rows. Each returned LATENT
+    carries "sc_batch" with the group id, its offset and the group size, so a batching
+    sampler can put the group back together without copying. Seeded noise is the same as
+    the request would get from its node on its own.
+    """
+
+    def __init__(self, window=0.005, max_batch=64):
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = {}
+        self.group_ids = itertools.count()
+        self.stats = {"requests": 0, "groups": 0, "samples": 0}
+
+    async def request(self, node_type, width, height, batch_size=1, init="zeros", seed=0, **options):
+        """(stage_c, stage_b) LATENT dicts of one request, allocated with its group."""
+        if batch_size > self.max_batch:
+            raise ValueError(f"batch_size {batch_size} is larger than max_batch {self.max_batch}")
+        plan = stable_cascade_planner.plan_dimensions(node_type, width, height, **options)
+        key = (plan["c_width"], plan["c_height"], plan["b_width"], plan["b_height"], init)
+
+        group = self.pending.get(key)
+        if group is not None and group.size + batch_size > self.max_batch:
+            self.flush(key)
+            group = None
+        if group is None:
+            loop = asyncio.get_running_loop()
+            group = LatentGroup(next(self.group_ids), plan, init, loop.create_future())
+            group.timer = loop.call_later(self.window, self.flush, key)
+            self.pending[key] = group
+
+        offset = group.size
+        group.requests.append((batch_size, seed))
+        group.size += batch_size
+        self.stats["requests"] += 1
+        if group.size >= self.max_batch:
+            self.flush(key)
+
+        c_samples, b_samples = await asyncio.shield(group.future)
+        sc_batch = {"group": group.group_id, "offset": offset, "batch_size": c_samples.shape[0]}
+        c_latent = {"samples": c_samples[offset:offset + batch_size], "sc_batch": sc_batch}
+        b_latent = {"samples": b_samples[offset:offset + batch_size], "sc_batch": sc_batch}
+        stable_cascade_costs.attach(plan, [c_latent], [b_latent])
+        return c_latent, b_latent
+
+    def flush(self, key):
+        group = self.pending.pop(key, None)
+        if group is None:
+            return
+        group.timer.cancel()
+        self.stats["groups"] += 1
+        self.stats["samples"] += group.size
+        asyncio.ensure_future(self.allocate(group))
+
+    async def allocate(self, group):
+        # Noise generation can take a while, keep it off the event loop
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, allocate_group, group.plan, group.init, group.requests)
+        except Exception as e:
+            group.future.set_exception(e)
+        else:
+            group.future.set_result(result)
+
+
+def allocate_group(plan, init, requests):
+    """Stage C and Stage B batches of a group, the rows of each request in order."""
+    if init != "noise":
+        batch_size = sum(size for size, seed in requests)
+        return (stable_cascade_latents.initial_latents([batch_size], 16, plan["c_height"], plan["c_width"], "stage_c")[0],
+                stable_cascade_latents.initial_latents([batch_size], 4, plan["b_height"], plan["b_width"], "stage_b")[0])
+
+    return (group_noise(requests, "stage_c", 16, plan["c_height"], plan["c_width"]),
+            group_noise(requests, "stage_b", 4, plan["b_height"], plan["b_width"]))
+
+def group_noise(requests, stream, channels, height, width):
+    """One noise batch for a group, each request's rows generated straight into place."""
+    samples = torch.empty([sum(size for size, seed in requests), channels, height, width], dtype=torch.float32, device=comfy.model_management.intermediate_device())
+    offset = 0
+    for size, seed in requests:
+        # Each request keeps its own seed, starting at sample 0 as on its own node
+        chunk = samples[offset:offset + size]
+        stable_cascade_latents.seeded_noise(seed, stream, list(chunk.shape), out=chunk)
+        offset += size
+    return samples
+
+
+SIMULATED_NODES = ["SC_EmptyLatentImageACF_plus", "SC_EmptyLatentImageAutoResonance", "SC_EmptyLatentImageAutoResonanceBasic", "SC_EmptyLatentImageAutoResonanceAdvanced"]
+SIMULATED_SIZES = [(1024, 1024), (1024, 1536), (1536, 1024), (1344, 768), (768, 1344), (2048, 2048)]
+
+async def simulate(requests=200, rate=2000.0, window=0.005, max_batch=64, init="zeros", nodes=None, sizes=None, check=True, seed=0):
+    """Drive a LatentCoalescer with Poisson arrivals of random requests and report on it.
+
+    With check every result is compared with the latents its node would create on its
+    own, so a broken split or a mixed up group shows up as a mismatch.
+    """
+    rng = random.Random(seed)
+    nodes = nodes or SIMULATED_NODES
+    sizes = sizes or SIMULATED_SIZES
+    coalescer = LatentCoalescer(window, max_batch)
+    latencies = []
+
+    async def client(node_type, width, height, batch_size, noise_seed):
+        started = time.perf_counter()
+        c_latent, b_latent = await coalescer.request(node_type, width, height, batch_size, init, noise_seed)
+        latencies.append(time.perf_counter() - started)
+        return (node_type, width, height, batch_size, noise_seed), c_latent, b_latent
+
+    tasks = []
+    for _ in range(requests):
+        width, height = rng.choice(sizes)
+        tasks.append(asyncio.ensure_future(client(rng.choice(nodes), width, height, rng.randint(1, 4), rng.randrange(2**32))))
+        await asyncio.sleep(rng.expovariate(rate))
+    results = await asyncio.gather(*tasks)
+
+    # Checked once everything is served, so the reference latents do not hold up the loop
+    mismatches = 0
+    for (node_type, width, height, batch_size, noise_seed), c_latent, b_latent in (results if check else []):
+        plan = stable_cascade_planner.plan_dimensions(node_type, width, height)
+        c_expected = stable_cascade_latents.initial_latents([batch_size], 16, plan["c_height"], plan["c_width"], "stage_c", init, noise_seed)[0]
+        b_expected = stable_cascade_latents.initial_latents([batch_size], 4, plan["b_height"], plan["b_width"], "stage_b", init, noise_seed)[0]
+        if not (torch.equal(c_latent["samples"], c_expected) and torch.equal(b_latent["samples"], b_expected)):
+            mismatches += 1
+
+    latencies.sort()
+    stats = dict(coalescer.stats)
+    stats["mean_group_size"] = stats["samples"] / max(1, stats["groups"])
+    stats["p50_latency_ms"] = latencies[len(latencies) // 2] * 1000
+    stats["max_latency_ms"] = latencies[-1] * 1000
+    stats["mismatches"] = mismatches
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent empty-latent requests through the shape coalescer.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=2000.0, help="Mean request arrivals per second.")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="How long a group waits for more requests.")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--init", choices=["zeros", "noise"], default="zeros")
+    parser.add_argument("--node", action="append", help="Node type to request, may be repeated (default: a mix of ACF and AutoResonance).")
+    parser.add_argument("--size", action="append", metavar="WIDTHxHEIGHT", help="Requested size, may be repeated (default: a mix of common sizes).")
+    parser.add_argument("--no-check", action="store_true", help="Skip comparing results with uncoalesced latents.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = [tuple(int(value) for value in size.lower().split("x")) for size in args.size] if args.size else None
+    stats = asyncio.run(simulate(args.requests, args.rate, args.window_ms / 1000, args.max_batch, args.init, args.node, sizes, not args.no_check, args.seed))
+    for name, value in stats.items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+    if stats["mismatches"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
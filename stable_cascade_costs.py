@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_planner
+import stable_cascade_paths
+
+# Cost records for planned latents, for schedulers that place prompts on workers and turn
+# away requests over budget before any sampling runs. The FLOP counts come from
+# stable_cascade_planner.estimate_cost(); the seconds need a calibration of this machine:
+#   python stable_cascade_costs.py --calibrate
+# torch is only imported by the benchmark, so reading a calibration stays dependency free.
+
+class CostCalibration:
+    """Measured matmul throughput of this machine, kept in a JSON file.
+
+    Configured with SC_COST_CALIBRATION (default cost_calibration.json in
+    stable_cascade_paths.data_directory()). Without a calibration the cost records carry FLOPs and bytes only.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.loaded = False
+
+    def get(self):
+        with self.lock:
+            if not self.loaded:
+                if self.path and os.path.exists(self.path):
+                    with open(self.path, "r") as f:
+                        self.data = json.load(f)
+                self.loaded = True
+            return self.data
+
+    def save(self, data):
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+            self.data = data
+            self.loaded = True
+
+    def flops_per_second(self):
+        data = self.get()
+        return data["flops_per_second"] if data else None
+
+
+def benchmark(device=None, dtype=None, size=4096, repeats=10):
+    """Sustained matmul throughput of device in FLOP/s, with the timing details.
+
+    Dense matmuls are what both stages spend their time in, so this is an upper bound on
+    what sampling reaches; the estimates it gives are optimistic rather than pessimistic.
+    """
+    import torch
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    if dtype is None:
+        dtype = torch.float16 if device != "cpu" else torch.float32
+
+    a = torch.randn(size, size, device=device, dtype=dtype)
+    b = torch.randn(size, size, device=device, dtype=dtype)
+    synchronize = torch.cuda.synchronize if str(device).startswith("cuda") else (lambda: None)
+
+    torch.matmul(a, b)
+    synchronize()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        torch.matmul(a, b)
+    synchronize()
+    seconds = time.perf_counter() - started
+
+    return {
+        "device": str(device),
+        "dtype": str(dtype).replace("torch.", ""),
+        "size": size,
+        "repeats": repeats,
+        "seconds": seconds,
+        "flops_per_second": 2 * size ** 3 * repeats / seconds,
+        "measured": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def calibrate(device=None, dtype=None, size=4096, repeats=10):
+    data = benchmark(device, dtype, size, repeats)
+    CALIBRATION.save(data)
+    return data
+
+def estimate(plan, batch_size=1, stage_c_model="big", stage_b_model="big"):
+    return stable_cascade_planner.estimate_cost(plan, batch_size, stage_c_model, stage_b_model, CALIBRATION.flops_per_second())
+
+def stage_cost(plan, samples, stage):
+    """One stage's share of estimate(): its tokens, GFLOPs and seconds per step, and the
+    bytes of samples themselves."""
+    cost = estimate(plan, samples.shape[0])
+    record = {"stage": stage, "batch_size": samples.shape[0], "latent_bytes": samples.nelement() * samples.element_size()}
+    record.update({key[len(stage) + 1:]: value for key, value in cost.items() if key.startswith(stage + "_")})
+    return record
+
+def attach(plan, c_latents, b_latents):
+    """Add an "sc_cost" record to every LATENT of a node's outputs, for its own sub-batch.
+
+    Each record only covers its own stage, Stage C latents the Stage C sampling and Stage B
+    latents the Stage B sampling, so summing the records of everything a prompt outputs
+    gives its total cost without counting any of it twice. ComfyUI's samplers copy the
+    latent dict and replace only "samples", so the record travels with the latent down the
+    graph.
+    """
+    for latent in c_latents:
+        latent["sc_cost"] = stage_cost(plan, latent["samples"], "stage_c")
+    for latent in b_latents:
+        latent["sc_cost"] = stage_cost(plan, latent["samples"], "stage_b")
+    return c_latents, b_latents
+
+
+CALIBRATION = CostCalibration(os.environ.get("SC_COST_CALIBRATION", stable_cascade_paths.data_path("cost_calibration.json")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate or query the Stable Cascade latent cost estimates.")
+    parser.add_argument("--calibrate", action="store_true", help="Benchmark this machine and save the calibration.")
+    parser.add_argument("--device", default=None, help="torch device to benchmark, default cuda when available.")
+    parser.add_argument("--size", type=int, default=4096, help="Side of the benchmark matrices.")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--node", default="SC_EmptyLatentImageACF_plus", help="Node type to estimate for.")
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.calibrate:
+        data = calibrate(args.device, None, args.size, args.repeats)
+        print(f"{data['flops_per_second'] / 1e12:.2f} TFLOP/s on {data['device']} ({data['dtype']}), saved to {CALIBRATION.path}")
+
+    plan = stable_cascade_planner.plan_dimensions(args.node, args.width, args.height)
+    print(json.dumps(estimate(plan, args.batch_size), indent=2))
+
+if __name__ == "__main__":
+    main()
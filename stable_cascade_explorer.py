@@ -0,0 +1,122 @@
+import argparse
+import csv
+import fnmatch
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_planner
+
+# Standalone resolution explorer: runs any node's planning over a width x height grid in
+# parallel and writes one row per combination. Needs nothing beyond this directory, e.g.
+#   python stable_cascade_explorer.py --node "SC_EmptyLatentImageACF_*" --width 512:2048:64 --height 512:2048:64 --format csv -o acf.csv
+
+COLUMNS = ["node", "width", "height", "compression", "gap", "c_width", "c_height", "b_width", "b_height"]
+
+def parse_range(text):
+    """'1024' or 'start:stop[:step]' with stop included, step defaulting to 32."""
+    parts = [int(part) for part in text.split(":")]
+    if len(parts) == 1:
+        return [parts[0]]
+    start, stop = parts[0], parts[1]
+    step = parts[2] if len(parts) > 2 else 32
+    return list(range(start, stop + 1, step))
+
+def parse_option(text):
+    key, _, value = text.partition("=")
+    for convert in (int, float):
+        try:
+            return key, convert(value)
+        except ValueError:
+            pass
+    if value.lower() in ("true", "false"):
+        return key, value.lower() == "true"
+    return key, value
+
+def select_nodes(patterns):
+    # Patterns may leave out the SC_EmptyLatentImage prefix, e.g. "AutoCascade*" or "ACF_plus*"
+    nodes = [node for node in stable_cascade_planner.NODE_PLANS if any(fnmatch.fnmatchcase(node, pattern) or fnmatch.fnmatchcase(node, "SC_EmptyLatentImage" + pattern) for pattern in patterns)]
+    if not nodes:
+        raise ValueError(f"No node type matches {patterns}, choose from {sorted(stable_cascade_planner.NODE_PLANS)}")
+    return nodes
+
+def plan_row(task):
+    # One width across every height, so each worker call amortises its pickling overhead
+    node, width, heights, options = task
+    rows = []
+    for height in heights:
+        plan = stable_cascade_planner.plan_dimensions(node, width, height, **options)
+        rows.append([node, width, height] + [plan[column] for column in COLUMNS[3:]])
+    return rows
+
+def explore(nodes, widths, heights, options=None, jobs=None):
+    """Plan every node over widths x heights; returns rows in COLUMNS order."""
+    tasks = [(node, width, heights, options or {}) for node in nodes for width in widths]
+    if jobs == 1 or len(tasks) == 1:
+        return [row for rows in map(plan_row, tasks) for row in rows]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return [row for rows in executor.map(plan_row, tasks, chunksize=max(1, len(tasks) // (4 * (jobs or os.cpu_count() or 1)))) for row in rows]
+
+
+def write_table(rows, output):
+    cells = [COLUMNS] + [["" if value is None else str(value) for value in row] for row in rows]
+    widths = [max(len(row[index]) for row in cells) for index in range(len(COLUMNS))]
+    for row in cells:
+        output.write("  ".join(value.rjust(width) for value, width in zip(row, widths)).rstrip() + "\n")
+
+def write_csv(rows, output):
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    writer.writerows(rows)
+
+def write_parquet(rows, path):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use --format csv otherwise")
+    columns = {name: [row[index] for row in rows] for index, name in enumerate(COLUMNS)}
+    # gap is infinite when no ACF compression matched and the fallback of 32 was used, which
+    # parquet stores fine as a float; non-ACF nodes have no gap at all
+    columns["gap"] = [None if gap is None else float(gap) for gap in columns["gap"]]
+    pyarrow.parquet.write_table(pyarrow.table(columns), path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan Stage C / Stage B latent sizes for a grid of resolutions.")
+    parser.add_argument("--node", action="append", help="Node type or glob pattern, may be repeated (default: all).")
+    parser.add_argument("--width", default="512:4096:32", help="Width or start:stop[:step], stop included.")
+    parser.add_argument("--height", default="512:4096:32", help="Height or start:stop[:step], stop included.")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE", help="Extra node input, e.g. offset=2 or target_mean=true.")
+    parser.add_argument("--format", choices=["table", "csv", "parquet"], default="table")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout, required for parquet).")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: one per core).")
+    parser.add_argument("--list", action="store_true", help="List the node types and exit.")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(sorted(stable_cascade_planner.NODE_PLANS)))
+        return
+
+    try:
+        nodes = select_nodes(args.node or ["*"])
+    except ValueError as e:
+        parser.error(str(e))
+    options = dict(parse_option(option) for option in args.option)
+    rows = explore(nodes, parse_range(args.width), parse_range(args.height), options, args.jobs)
+
+    if args.format == "parquet":
+        if not args.output:
+            parser.error("--format parquet needs --output")
+        write_parquet(rows, args.output)
+        return
+
+    write = write_csv if args.format == "csv" else write_table
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            write(rows, f)
+    else:
+        write(rows, sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import cProfile
+import functools
+import itertools
+import json
+import os
+import random
+import threading
+import sys
+import time
+import torch
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_paths
+
+# Shared by every node in this repo. Node files import it after adding their own directory
+# to sys.path, so all of them record into the one REGISTRY below.
+
+class MetricsRegistry:
+    """Process-wide wall time and memory counters per node and phase.
+
+    Recording is off unless SC_METRICS=1 is set or enable() is called, in which case
+    start() hands out a no-op timer and the nodes pay nothing.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("SC_METRICS", "0") not in ("", "0", "false", "False")
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.memory = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.phases = {}
+            self.memory = {}
+
+    def start(self, node):
+        if not self.enabled:
+            return NULL_TIMER
+        return NodeTimer(self, node)
+
+    def record_time(self, node, phase, seconds):
+        with self.lock:
+            entry = self.phases.setdefault((node, phase), {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def record_memory(self, node, output_bytes, device_peak_bytes):
+        with self.lock:
+            entry = self.memory.setdefault(node, {"output_bytes": 0, "device_peak_bytes": 0})
+            entry["output_bytes"] = max(entry["output_bytes"], output_bytes)
+            entry["device_peak_bytes"] = max(entry["device_peak_bytes"], device_peak_bytes)
+
+    def snapshot(self):
+        with self.lock:
+            nodes = {}
+            for (node, phase), entry in self.phases.items():
+                nodes.setdefault(node, {"phases": {}, "memory": {}})["phases"][phase] = dict(entry)
+            for node, entry in self.memory.items():
+                nodes.setdefault(node, {"phases": {}, "memory": {}})["memory"] = dict(entry)
+        return nodes
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        metrics = [
+            ("sc_phase_calls_total", "counter", "Number of timed executions per node phase.", "phases", "count"),
+            ("sc_phase_seconds_total", "counter", "Total wall time spent per node phase.", "phases", "total_seconds"),
+            ("sc_phase_seconds_max", "gauge", "Slowest single execution per node phase.", "phases", "max_seconds"),
+            ("sc_output_bytes_max", "gauge", "Largest total size of the tensors a node returned.", "memory", "output_bytes"),
+            ("sc_device_peak_bytes_max", "gauge", "Highest peak device memory a node execution allocated above what was allocated when it started.", "memory", "device_peak_bytes"),
+        ]
+
+        lines = []
+        for name, kind, help_text, section, key in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for node in sorted(snapshot):
+                if section == "phases":
+                    for phase in sorted(snapshot[node]["phases"]):
+                        value = snapshot[node]["phases"][phase][key]
+                        lines.append(f'{name}{{node="{node}",phase="{phase}"}} {value}')
+                elif snapshot[node]["memory"]:
+                    lines.append(f'{name}{{node="{node}"}} {snapshot[node]["memory"][key]}')
+        return "\n".join(lines) + "\n"
+
+
+class NodeTimer:
+    """Lap timer for one node execution; mark(phase) records the time since the last mark."""
+
+    def __init__(self, registry, node):
+        self.registry = registry
+        self.node = node
+        self.cuda = torch.cuda.is_available()
+        if self.cuda:
+            # The peak counter is process-wide, so it is read against a baseline instead of
+            # being reset under concurrent executions and other users of it
+            self.baseline = torch.cuda.memory_allocated()
+            self.start_peak = torch.cuda.max_memory_allocated()
+        self.started = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.registry.record_time(self.node, phase, now - self.last)
+        self.last = now
+
+    def finish(self, *tensors):
+        self.registry.record_time(self.node, "total", time.perf_counter() - self.started)
+        output_bytes = sum(t.numel() * t.element_size() for t in tensors)
+        device_peak_bytes = 0
+        if self.cuda:
+            # The process peak only moves when this execution went past it; otherwise what it
+            # still holds is the best known bound
+            peak = torch.cuda.max_memory_allocated()
+            device_peak_bytes = max(0, (peak if peak > self.start_peak else torch.cuda.memory_allocated()) - self.baseline)
+        self.registry.record_memory(self.node, output_bytes, device_peak_bytes)
+
+
+class NullTimer:
+    def mark(self, phase):
+        pass
+
+    def finish(self, *tensors):
+        pass
+
+
+class ExecutionProfiler:
+    """Wraps sampled node executions in torch.profiler or cProfile and writes one file each.
+
+    Configured with SC_PROFILE (torch or cprofile), SC_PROFILE_DIR (default profiles in
+    stable_cascade_paths.data_directory()) and SC_PROFILE_SAMPLE (fraction of executions,
+    default 1), or with configure() at runtime, which only changes the settings it is
+    given (mode="" turns profiling off). Only one execution is profiled at a time;
+    concurrent ones run unprofiled.
+    """
+
+    def __init__(self):
+        self.mode = os.environ.get("SC_PROFILE", "").lower() or None
+        self.directory = os.environ.get("SC_PROFILE_DIR", stable_cascade_paths.data_path("profiles"))
+        self.sample_rate = float(os.environ.get("SC_PROFILE_SAMPLE", "1"))
+        self.lock = threading.Lock()
+        self.sequence = itertools.count()
+
+    def configure(self, mode=None, directory=None, sample_rate=None):
+        if mode is not None:
+            self.mode = mode or None
+        if directory is not None:
+            self.directory = directory
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def trace_path(self, node, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{node}_{prompt_id()}_{int(time.time() * 1000)}_{next(self.sequence)}.{extension}")
+
+    def run(self, node, function, *args, **kwargs):
+        if self.mode not in ("torch", "cprofile") or random.random() >= self.sample_rate:
+            return function(*args, **kwargs)
+        if not self.lock.acquire(blocking=False):
+            return function(*args, **kwargs)
+
+        try:
+            if self.mode == "torch":
+                with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True) as profiler:
+                    result = function(*args, **kwargs)
+                path = self.trace_path(node, "json")
+                profiler.export_chrome_trace(path)
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    result = function(*args, **kwargs)
+                finally:
+                    profiler.disable()
+                path = self.trace_path(node, "prof")
+                profiler.dump_stats(path)
+        finally:
+            self.lock.release()
+
+        print(f"Profile of {node} written to {path}")
+        return result
+
+
+def prompt_id():
+    # The prompt currently executing, when running inside ComfyUI
+    try:
+        import server
+        return server.PromptServer.instance.last_prompt_id or "noprompt"
+    except Exception:
+        return "noprompt"
+
+def profiled(function):
+    """Decorator for node entry points, profiled according to PROFILER's settings."""
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        return PROFILER.run(type(self).__name__, function, self, *args, **kwargs)
+    return wrapper
+
+
+NULL_TIMER = NullTimer()
+REGISTRY = MetricsRegistry()
+PROFILER = ExecutionProfiler()
+
+start = REGISTRY.start
+enable = REGISTRY.enable
+disable = REGISTRY.disable
+reset = REGISTRY.reset
+snapshot = REGISTRY.snapshot
+to_json = REGISTRY.to_json
+to_prometheus = REGISTRY.to_prometheus
+configure_profiling = PROFILER.configure
@@ -0,0 +1,187 @@
+import torch
+import comfy.model_management
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_planner
+
+# Torch side of the planner, shared by the empty latent nodes: turns a plan from
+# stable_cascade_planner.plan_dimensions() into tensors and keeps batches within memory.
+
+# Optional inputs of every node with a batch_size
+MEMORY_INPUTS = {
+    "memory_limit": (["off", "max_memory_mb", "auto"], {"default": "off", "tooltip": "Lower batch_size until the latents fit in max_memory_mb, or in the free memory of the device (auto)."}),
+    "max_memory_mb": ("INT", {"default": 8192, "min": 1, "max": 1048576, "tooltip": "Memory budget for the stage_c and stage_b latents together."}),
+    "chunk_size": ("INT", {"default": 0, "min": 0, "max": 4096, "tooltip": "Output the batch as a list of latents of at most this many each, so downstream nodes run per chunk. 0 outputs one batch. With memory_limit the chunks are kept within the budget instead of the whole batch."}),
+}
+
+# Optional inputs of every node with empty latents
+NOISE_INPUTS = {
+    "init": (["zeros", "noise"], {"default": "zeros", "tooltip": "Fill the empty latents with zeros, or with seeded standard normal noise."}),
+    "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Noise seed. Sample i of a batch is the same whatever the batch size or chunking."}),
+}
+
+# Optional inputs of every node with a batch_size, for splitting one batch across hosts
+SHARD_INPUTS = {
+    "shard_index": ("INT", {"default": 0, "min": 0, "max": 4095, "tooltip": "Which shard of the batch this node outputs, counting from 0."}),
+    "shard_count": ("INT", {"default": 1, "min": 1, "max": 4096, "tooltip": "Split batch_size into this many contiguous shards and output only shard_index. Seeded noise is the same as in the unsharded batch."}),
+}
+
+# Noise streams, so stage_c and stage_b noise of the same seed are independent
+NOISE_STREAMS = {"stage_c": 1, "stage_b": 2}
+
+def memory_budget(memory_limit="off", max_memory_mb=8192):
+    """Budget in bytes for memory_limit, or None when batches are unlimited."""
+    if memory_limit == "max_memory_mb":
+        return max_memory_mb * 1024 * 1024
+    if memory_limit == "auto":
+        return comfy.model_management.get_free_memory(comfy.model_management.get_torch_device())
+    return None
+
+def limit_batch_size(plan, batch_size, memory_limit="off", max_memory_mb=8192):
+    """Largest batch up to batch_size whose latents fit in the budget of memory_limit.
+
+    Raises ValueError when not even a single latent fits, so an oversized request fails
+    as a node error instead of taking the whole process down mid-allocation.
+    """
+    budget = memory_budget(memory_limit, max_memory_mb)
+    if budget is None:
+        return batch_size
+
+    safe_batch_size = stable_cascade_planner.max_batch_size(plan, budget)
+    if safe_batch_size < 1:
+        raise ValueError(f"One Stage C {plan['c_width']}x{plan['c_height']} and Stage B {plan['b_width']}x{plan['b_height']} latent needs {stable_cascade_planner.latent_bytes(plan) / 2**20:.1f} MB, more than the {budget / 2**20:.1f} MB available")
+    if batch_size > safe_batch_size:
+        print(f"Batch size {batch_size} needs {stable_cascade_planner.latent_bytes(plan, batch_size) / 2**20:.1f} MB of latents, clamped to {safe_batch_size} to fit in {budget / 2**20:.1f} MB")
+        return safe_batch_size
+    return batch_size
+
+def plan_batches(plan, batch_size, chunk_size=0, memory_limit="off", max_memory_mb=8192):
+    """Sizes of the sub-batches a node outputs, one per list entry.
+
+    Without chunk_size the whole batch is one entry, clamped to the memory budget. With it
+    the budget bounds each chunk instead, and the full batch_size is always emitted.
+    """
+    if chunk_size <= 0:
+        return [limit_batch_size(plan, batch_size, memory_limit, max_memory_mb)]
+
+    chunk_size = limit_batch_size(plan, min(chunk_size, batch_size), memory_limit, max_memory_mb)
+    full_chunks, remainder = divmod(batch_size, chunk_size)
+    return [chunk_size] * full_chunks + ([remainder] if remainder else [])
+
+def shard_range(batch_size, shard_index=0, shard_count=1):
+    """(start, size) of shard shard_index when batch_size is split into shard_count shards.
+
+    Shards are contiguous and differ in size by at most one, the first batch_size %
+    shard_count shards taking the extra sample, so concatenating the shards in order gives
+    the unsharded batch.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index {shard_index} is out of range for {shard_count} shards")
+    if shard_count > batch_size:
+        raise ValueError(f"batch_size {batch_size} cannot be split into {shard_count} shards, every shard needs at least one latent")
+    base, extra = divmod(batch_size, shard_count)
+    start = shard_index * base + min(shard_index, extra)
+    return start, base + (1 if shard_index < extra else 0)
+
+def latent_list(samples, batch_sizes):
+    """LATENT list of empty sub-batches, each a view of samples.
+
+    Empty latents are all alike, so samples only needs to hold the largest sub-batch and
+    memory stays bounded by the chunk size. Downstream nodes treat their inputs as
+    read-only, as ComfyUI's own do, so sharing the allocation is safe.
+    """
+    return [{"samples": samples[:batch_size]} for batch_size in batch_sizes]
+
+def split_latents(samples, batch_sizes, chunked=True):
+    """LATENT list of samples split into the sub-batches of batch_sizes.
+
+    samples is an encoded batch, to be paired entry by entry with the empty latents of
+    batch_sizes. When its size differs from theirs (more images than batch_size, or a
+    batch clamped to the memory budget) it is cut into chunks of the first sub-batch size,
+    or kept whole when the batch is not chunked.
+    """
+    if sum(batch_sizes) == samples.shape[0]:
+        sizes = batch_sizes
+    else:
+        sizes = batch_sizes[0] if chunked else samples.shape[0]
+    return [{"samples": chunk} for chunk in torch.split(samples, sizes)]
+
+def lowbias32(x):
+    """lowbias32 integer hash (Chris Wellons) of an int32 tensor read as uint32 bit patterns."""
+    # int32 products wrap exactly like uint32 ones, and the masks turn the arithmetic right
+    # shifts into logical ones; 0x846ca68b does not fit an int32 and is written as its wrap
+    x = x ^ ((x >> 16) & 0xffff)
+    x = x * 0x7feb352d
+    x = x ^ ((x >> 15) & 0x1ffff)
+    x = x * -0x7b935975
+    return x ^ ((x >> 16) & 0xffff)
+
+def int32(value):
+    """Python int in [0, 2**32) as the int32 with the same bits."""
+    value &= 0xffffffff
+    return value - (1 << 32) if value >= (1 << 31) else value
+
+def seeded_noise(seed, stream, shape, start_index=0, device=None, block_elements=1 << 24, out=None):
+    """Standard normal noise of shape [N, ...] that is counter-based per sample.
+
+    Every value is a hash of (seed, stream, start_index + n, position within the sample)
+    turned into a normal with Box-Muller, so sample n never depends on the rest of the
+    batch: a chunk, a shard or a single sample generated alone is identical to the same
+    samples of the full batch. The noise is computed on device in blocks of samples and
+    each block is copied into out (by default a new tensor on the intermediate device),
+    so device memory is bounded by block_elements whatever the batch size.
+    """
+    if device is None:
+        device = comfy.model_management.get_torch_device()
+    if out is None:
+        out = torch.empty(shape, dtype=torch.float32, device=comfy.model_management.intermediate_device())
+    batch_size = shape[0]
+    per_sample = 1
+    for size in shape[1:]:
+        per_sample *= size
+    pairs = (per_sample + 1) // 2
+
+    # 64-bit seeds fold their high word in through one more hash
+    high = int(lowbias32(torch.tensor([int32(seed >> 32)], dtype=torch.int32))[0])
+    key = lowbias32(torch.tensor([int32(seed ^ high ^ NOISE_STREAMS.get(stream, stream))], dtype=torch.int32, device=device))
+    counters = lowbias32(torch.arange(2 * pairs, dtype=torch.int32, device=device))
+    flat_out = out.view(batch_size, per_sample)
+
+    block = max(1, block_elements // (2 * pairs))
+    for start in range(0, batch_size, block):
+        rows = min(block, batch_size - start)
+        indices = torch.arange(start_index + start, start_index + start + rows, dtype=torch.int32, device=device)
+        sample_keys = lowbias32(key ^ indices)
+        bits = lowbias32(sample_keys[:, None] ^ counters[None, :]).view(rows, pairs, 2)
+        # Uniforms in (0, 1) from the top 24 bits, exact in float32 and never 0
+        uniform = (((bits >> 8) & 0xffffff).to(torch.float32) + 0.5) / 16777216.0
+        radius = torch.sqrt(-2.0 * torch.log(uniform[..., 0]))
+        angle = 2.0 * torch.pi * uniform[..., 1]
+        normals = torch.empty([rows, pairs, 2], dtype=torch.float32, device=device)
+        torch.mul(radius, torch.cos(angle), out=normals[..., 0])
+        torch.mul(radius, torch.sin(angle), out=normals[..., 1])
+        flat_out[start:start + rows].copy_(normals.view(rows, 2 * pairs)[:, :per_sample])
+
+    return out
+
+def initial_latents(batch_sizes, channels, height, width, stream, init="zeros", seed=0, start_index=0):
+    """(tensor, LATENT list) of empty latents for the sub-batches in batch_sizes.
+
+    Zeros share one allocation the size of the largest sub-batch (see latent_list()).
+    Noise is generated sub-batch by sub-batch into one output, each from its global sample
+    index onwards starting at start_index, so it is identical to the unchunked batch while
+    the device only ever works on a block of one sub-batch.
+    """
+    if init == "noise":
+        samples = torch.empty([sum(batch_sizes), channels, height, width], dtype=torch.float32, device=comfy.model_management.intermediate_device())
+        latents = []
+        offset = 0
+        for batch_size in batch_sizes:
+            chunk = samples[offset:offset + batch_size]
+            seeded_noise(seed, stream, list(chunk.shape), start_index + offset, out=chunk)
+            latents.append({"samples": chunk})
+            offset += batch_size
+        return samples, latents
+    samples = torch.zeros([max(batch_sizes), channels, height, width])
+    return samples, latent_list(samples, batch_sizes)
@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+# Where the files this repo writes go by default. Inside ComfyUI that is a stable_cascade
+# directory in ComfyUI's user directory, elsewhere the temp directory, never the working
+# directory the server happened to be started from. Each setting still has its own
+# environment variable to put its files anywhere else.
+
+def data_directory():
+    try:
+        import folder_paths
+        base = folder_paths.get_user_directory()
+    except (ImportError, AttributeError):
+        base = tempfile.gettempdir()
+    return os.path.join(base, "stable_cascade")
+
+def data_path(name):
+    return os.path.join(data_directory(), name)
+
+# Paths typed into node inputs come from whoever can queue a prompt, so nodes resolve them
+# under ComfyUI's input or output directory (the temp directory outside ComfyUI) and refuse
+# anything that leads out of it. The Python API and command line tools take paths as given.
+
+def comfy_directory(kind):
+    try:
+        import folder_paths
+        return folder_paths.get_input_directory() if kind == "input" else folder_paths.get_output_directory()
+    except (ImportError, AttributeError):
+        return tempfile.gettempdir()
+
+def confined_path(path, kind="output"):
+    """path resolved under comfy_directory(kind); raises ValueError if it leads outside it."""
+    base = os.path.realpath(comfy_directory(kind))
+    resolved = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, resolved]) != base:
+        raise ValueError(f"{path} is outside the ComfyUI {kind} directory {base}")
+    return resolved
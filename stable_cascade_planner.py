@@ -0,0 +1,703 @@
+import bisect
+import contextlib
+import contextvars
+import math
+import threading
+
+# Planning for every node in this repo. Pure Python on purpose: nothing here imports torch
+# or ComfyUI, so the same code can answer shape-only questions outside a running graph.
+#
+# Everything is reentrant so node instances can be shared by concurrent executions: the
+# planning functions keep no per-call state and return new values, and the caches only
+# store results computed purely from their keys, so two threads racing on a miss write
+# identical entries. The factories below take a lock so each parameter set has exactly
+# one planner and one index. Every cache is cleared once it holds CACHE_LIMIT entries, so
+# callers planning arbitrary sizes, like the preview route, cannot grow them without bound.
+CACHE_LIMIT = 65536
+PLANNER_LIMIT = 256
+
+PRESET_LATENT_SIZES = [
+    (61, 16), (60, 16), (59, 17), (58, 17), (57, 17), (56, 18), (55, 18), (54, 18),
+    (53, 19), (52, 19), (51, 19), (50, 20), (49, 20), (48, 20), (48, 21), (47, 21),
+    (46, 21), (46, 22), (45, 22), (44, 22), (44, 23), (43, 23), (42, 23), (42, 24),
+    (41, 24), (40, 24), (40, 25), (39, 25), (39, 26), (38, 26), (37, 26), (37, 27),
+    (36, 27), (36, 28), (35, 28), (35, 29), (34, 29), (34, 30), (33, 30), (33, 31),
+    (32, 31), (32, 32), (31, 32), (30, 33), (30, 34), (29, 34), (29, 35), (28, 35),
+    (28, 36), (27, 36), (27, 37), (26, 37), (26, 38), (26, 39), (25, 39), (25, 40),
+    (24, 40), (24, 41), (24, 42), (23, 42), (23, 43), (23, 44), (22, 44), (22, 45),
+    (22, 46), (21, 46), (21, 47), (21, 48), (20, 48), (20, 49), (20, 50), (20, 51),
+    (19, 51), (19, 52), (19, 53), (18, 53), (18, 54), (18, 55), (18, 56), (17, 56),
+    (17, 57), (17, 58), (17, 59), (17, 60), (16, 60), (16, 61)
+]
+
+# Stage C latent mean targets per model size: the mean grows from center_min for square
+# images to center_max at aspect 3.75, searching compression factors down from compression_max
+MODEL_SIZES = {
+    "1024": {"center_min": 32, "center_max": 38.5, "compression_max": 128},
+    "768": {"center_min": 24, "center_max": 28.875, "compression_max": 168},
+}
+
+# Parameters of the Stage C and Stage B models. Sampling costs about 2 FLOPs per parameter
+# per token and step, where Stage C sees one token per latent pixel and Stage B one per
+# STAGE_B_PATCH x STAGE_B_PATCH patch of its latent. Good for comparing plans and setting
+# budgets, not an exact count.
+MODEL_PARAMETERS = {
+    "stage_c": {"big": 3.6e9, "lite": 1.0e9},
+    "stage_b": {"big": 1.5e9, "lite": 0.7e9},
+}
+STAGE_B_PATCH = 4
+
+
+def remap(value, from1, to1, from2, to2):
+    return (value - from1) / (to1 - from1) * (to2 - from2) + from2
+
+def clamp(value, min_value, max_value):
+    return max(min_value, min(value, max_value))
+
+def round_half_up(value):
+    return int(math.floor(value + 0.5))
+
+def round_to_multiple(value, multiple):
+    return int(math.ceil(value / multiple) * multiple)
+
+def ensure_divisible_by_32(value):
+    if value % 32 != 0:  # Check if number is not divisible by 32
+        value = (value // 32) * 32 + 32  # Round up to the nearest multiple of 32
+    return value
+
+# Stage B constraints. Stage B latents are a quarter of the pixel size, which has to be a
+# multiple of 32, so both edges must be multiples of 8. Stage B upscales the Stage C latent
+# by b * 4 / c per edge and tends to fall apart past 80. The aspect tolerance allows for
+# the flooring of small Stage C latents (ACF nodes stay within 16%) but catches presets
+# stretched onto a much wider or taller image.
+STAGE_B_MULTIPLE = 8
+STAGE_B_MIN_COMPRESSION = 16
+STAGE_B_MAX_COMPRESSION = 80
+STAGE_B_ASPECT_TOLERANCE = 0.2
+
+
+class ACFPlanner:
+    """Adaptive compression factor search for one Stable Cascade model size.
+
+    The ACF nodes all run this search with different constants: the Stage C latent mean
+    they aim for grows linearly from center_min at aspect_min to center_max at aspect_max,
+    and the compression factors compression_max down to compression_min are tried. method
+    selects the matching rule of the node family:
+
+        plus  smallest gap among truncation, rounding or range matches (ACF_plus)
+        min   smallest gap overall (ACF_plus_min, AutoResonanceAdvancedACF)
+        alt   first truncation or rounding match (ACF_alt)
+
+    Results only depend on the short and long edge and are kept in a lookup index, which
+    precompute() can fill ahead of time for a grid of sizes.
+    """
+
+    def __init__(self, center_min, center_max, aspect_min=1, aspect_max=3.75, compression_max=128, compression_min=16, method="plus", default=32):
+        self.center_min = center_min
+        self.center_max = center_max
+        self.aspect_min = aspect_min
+        self.aspect_max = aspect_max
+        self.compression_max = compression_max
+        self.compression_min = compression_min
+        self.method = method
+        self.default = default
+        self.index = {}
+
+    def center(self, aspect):
+        new_center = remap(aspect, self.aspect_min, self.aspect_max, self.center_min, self.center_max)
+        return clamp(new_center, self.center_min, self.center_max)
+
+    def matches(self, latent_div, new_center):
+        if int(latent_div) == int(new_center):  # Truncation match
+            return True
+        if self.method == "alt":
+            return round(latent_div) == round(new_center)
+        if round_half_up(latent_div) == round_half_up(new_center):  # Rounding match
+            return True
+        return new_center - 1 <= latent_div <= new_center  # Within range match
+
+    def solve(self, width, height):
+        """Return (compression, gap) for the given dimensions."""
+        key = (min(width, height), max(width, height))
+        result = self.index.get(key)
+        if result is None:
+            result = self.search(*key)
+            self.store(key, result)
+        return result
+
+    def store(self, key, result):
+        if len(self.index) >= CACHE_LIMIT:
+            self.index.clear()
+        self.index[key] = result
+
+    def latent_div(self, res_se, res_le, compression):
+        return (res_se // compression + res_le // compression) / 2
+
+    def search(self, res_se, res_le, high=None, low=None):
+        """Run the search over compression factors high down to low (default: all of them)."""
+        if high is None:
+            high = self.compression_max
+        if low is None:
+            low = self.compression_min
+
+        aspect = res_le / res_se
+        new_center = self.center(aspect)
+
+        final_compression_factor = None
+        smallest_gap = float('inf')
+
+        # Start from the highest compression factor as lower factors have better quality
+        for compression in range(high, low - 1, -1):
+            latent_div = self.latent_div(res_se, res_le, compression)
+            gap = abs(latent_div - new_center)
+
+            if self.method == "alt":
+                if self.matches(latent_div, new_center):
+                    return compression, gap
+            elif self.method == "min" or self.matches(latent_div, new_center):
+                if gap < smallest_gap:
+                    smallest_gap = gap
+                    final_compression_factor = compression
+
+        if final_compression_factor is None:
+            return self.default, float('inf')
+        return final_compression_factor, smallest_gap
+
+    def search_near(self, res_se, res_le, compression, radius):
+        """Search only compression +/- radius, or return None if that could differ from search().
+
+        latent_div never increases with the compression factor, and every matching rule
+        needs latent_div within 1 of the center. So once latent_div is below center - 1 at
+        the top of the window and above center + 1 at the bottom, nothing outside the window
+        can match or beat it. The one exception is a "min" result on the top edge, which a
+        larger factor with the same latent_div would win on ties.
+        """
+        high = min(compression + radius, self.compression_max)
+        low = max(compression - radius, self.compression_min)
+        new_center = self.center(res_le / res_se)
+
+        if high < self.compression_max and not self.latent_div(res_se, res_le, high) < new_center - 1:
+            return None
+        if low > self.compression_min and not self.latent_div(res_se, res_le, low) > new_center + 1:
+            return None
+
+        result = self.search(res_se, res_le, high, low)
+        if self.method == "min" and result[0] == high and high < self.compression_max:
+            return None
+        return result
+
+    def precompute(self, min_size=512, max_size=4096, step=32):
+        for short_edge in range(min_size, max_size + 1, step):
+            for long_edge in range(short_edge, max_size + 1, step):
+                self.solve(short_edge, long_edge)
+
+
+class IncrementalACFPlanner:
+    """Stateful wrapper around an ACFPlanner for inputs that change a step at a time.
+
+    Dragging a width or height slider moves the compression factor by a few steps at most,
+    so update() first searches the neighbourhood of the previous answer and only falls back
+    to the full search when search_near() cannot prove the neighbourhood holds the answer.
+    Results are always identical to ACFPlanner.solve(). last_compression is only a starting
+    hint, so sharing one instance between threads can cost speed but never correctness.
+    """
+
+    def __init__(self, acf, radius=8):
+        self.acf = acf
+        self.radius = radius
+        self.last_compression = None
+
+    def update(self, width, height):
+        key = (min(width, height), max(width, height))
+        result = self.acf.index.get(key)
+
+        if result is None and self.last_compression is not None:
+            result = self.acf.search_near(key[0], key[1], self.last_compression, self.radius)
+            if result is not None:
+                self.acf.store(key, result)
+
+        if result is None:
+            result = self.acf.solve(width, height)
+
+        self.last_compression = result[0]
+        return result
+
+
+class StageBPlanner:
+    """Valid Stage B sizes for a Stage C latent, and the one closest to a target size.
+
+    The valid sizes for one Stage C latent form a ladder: every long edge that is a multiple
+    of 8 within the compression limits, paired with the multiple of 8 nearest the Stage C
+    aspect on the short edge. Ladders are built once per Stage C size and searched with
+    bisect, and precompute() can build them ahead of time.
+    """
+
+    def __init__(self, min_compression=STAGE_B_MIN_COMPRESSION, max_compression=STAGE_B_MAX_COMPRESSION, aspect_tolerance=STAGE_B_ASPECT_TOLERANCE, multiple=STAGE_B_MULTIPLE):
+        self.min_compression = min_compression
+        self.max_compression = max_compression
+        self.aspect_tolerance = aspect_tolerance
+        self.multiple = multiple
+        self.ladders = {}
+
+    def ladder(self, c_width, c_height):
+        """Valid (long edge, short edge) pairs in Stage B latent units, smallest first."""
+        key = (min(c_width, c_height), max(c_width, c_height))
+        if key not in self.ladders:
+            c_short, c_long = key
+            m = self.multiple
+            sizes = []
+            if c_short > 0:
+                first = round_to_multiple(c_long * self.min_compression / 4, m)
+                for long_edge in range(first, int(c_long * self.max_compression / 4) + 1, m):
+                    short_edge = max(m, round_half_up(long_edge * c_short / c_long / m) * m)
+                    if not stage_b_problems(c_long, c_short, long_edge, short_edge, self.max_compression, self.aspect_tolerance, m):
+                        sizes.append((long_edge, short_edge))
+            if len(self.ladders) >= CACHE_LIMIT:
+                self.ladders.clear()
+            self.ladders[key] = sizes
+        return self.ladders[key]
+
+    def closest(self, c_width, c_height, width, height, max_pixels=None):
+        """Stage B (b_width, b_height) nearest to width x height pixels.
+
+        max_pixels caps the Stage B pixel area (b_width * 4 * b_height * 4), the quantity
+        Stage B memory and compute scale with.
+        """
+        sizes = self.ladder(c_width, c_height)
+        if max_pixels is not None:
+            areas = [long_edge * short_edge * 16 for long_edge, short_edge in sizes]
+            sizes = sizes[:bisect.bisect_right(areas, max_pixels)]
+        if not sizes:
+            raise ValueError(f"No valid Stage B size for Stage C {c_width}x{c_height}" + (f" within {max_pixels} pixels" if max_pixels is not None else ""))
+
+        target = max(width, height) / 4
+        index = bisect.bisect_left([long_edge for long_edge, _ in sizes], target)
+        nearby = sizes[max(index - 1, 0):index + 1]
+        long_edge, short_edge = min(nearby, key=lambda size: abs(size[0] - target))
+        return (long_edge, short_edge) if c_width >= c_height else (short_edge, long_edge)
+
+    def precompute(self, c_sizes):
+        for c_width, c_height in c_sizes:
+            self.ladder(c_width, c_height)
+
+
+class PresetPlanner:
+    """Nearest-aspect lookup in PRESET_LATENT_SIZES, optionally scaled for smaller models."""
+
+    def __init__(self, scale=1.0, sizes=PRESET_LATENT_SIZES):
+        self.scale = scale
+        self.sizes = [(int(x * scale), int(y * scale)) for x, y in sizes]
+
+    def match(self, width, height):
+        input_aspect_ratio = width / height
+        return min(self.sizes, key=lambda size: abs((size[0] / size[1]) - input_aspect_ratio))
+
+
+_acf_planners = {}
+_preset_planners = {}
+_incremental_planners = {}
+_planners_lock = threading.Lock()
+
+# Set inside incremental_search() blocks
+_incremental = contextvars.ContextVar("incremental", default=False)
+
+def acf_planner(center_min, center_max, aspect_min=1, aspect_max=3.75, compression_max=128, compression_min=16, method="plus"):
+    """Shared ACFPlanner for these parameters, so every node using them shares one index."""
+    key = (center_min, center_max, aspect_min, aspect_max, compression_max, compression_min, method)
+    with _planners_lock:
+        if key not in _acf_planners:
+            if len(_acf_planners) >= PLANNER_LIMIT:
+                _acf_planners.clear()
+            _acf_planners[key] = ACFPlanner(center_min, center_max, aspect_min, aspect_max, compression_max, compression_min, method)
+        return _acf_planners[key]
+
+def model_acf_planner(model_size, method="plus"):
+    return acf_planner(method=method, **MODEL_SIZES[model_size])
+
+def incremental_planner(acf):
+    """Shared IncrementalACFPlanner over acf."""
+    with _planners_lock:
+        if acf not in _incremental_planners:
+            if len(_incremental_planners) >= PLANNER_LIMIT:
+                _incremental_planners.clear()
+            _incremental_planners[acf] = IncrementalACFPlanner(acf)
+        return _incremental_planners[acf]
+
+@contextlib.contextmanager
+def incremental_search():
+    """Within this block ACF plans start from the previous answer, see IncrementalACFPlanner.
+
+    For callers whose sizes move a step at a time, like the preview route following a
+    slider. Plans are identical either way.
+    """
+    token = _incremental.set(True)
+    try:
+        yield
+    finally:
+        _incremental.reset(token)
+
+def stage_b_problems(c_width, c_height, b_width, b_height, max_compression=STAGE_B_MAX_COMPRESSION, aspect_tolerance=STAGE_B_ASPECT_TOLERANCE, multiple=STAGE_B_MULTIPLE):
+    """Names of the Stage B constraints a shape breaks: size, multiple, compression, aspect."""
+    if min(c_width, c_height, b_width, b_height) <= 0:
+        return ["size"]
+    problems = []
+    if b_width % multiple or b_height % multiple:
+        problems.append("multiple")
+    if max(b_width * 4 / c_width, b_height * 4 / c_height) > max_compression:
+        problems.append("compression")
+    if abs((b_width / b_height) / (c_width / c_height) - 1) > aspect_tolerance:
+        problems.append("aspect")
+    return problems
+
+def check_stage_b(plan):
+    """Preflight for a plan: warnings for Stage B shapes that are likely to fail."""
+    c_width, c_height, b_width, b_height = plan["c_width"], plan["c_height"], plan["b_width"], plan["b_height"]
+    warnings = []
+    for problem in stage_b_problems(c_width, c_height, b_width, b_height):
+        if problem == "size":
+            warnings.append(f"Warning! Latent dimensions must be positive, got Stage C {c_width}x{c_height} and Stage B {b_width}x{b_height}.")
+        elif problem == "multiple":
+            warnings.append(f"Warning! Stage B latent {b_width}x{b_height} is not a multiple of {STAGE_B_MULTIPLE}, the image size should be a multiple of 32.")
+        elif problem == "compression":
+            warnings.append(f"Warning! Compression factors over 80 are likely to not work when the latent is passed to Stage B. Consider a lower resolution or using Img2Img at 32 compression for higher resolutions.")
+        else:
+            warnings.append(f"Warning! Stage B aspect {b_width / b_height:.3f} is far from the Stage C aspect {c_width / c_height:.3f}, the image will come out stretched.")
+    return warnings
+
+def latent_bytes(plan, batch_size=1, element_size=4):
+    """Bytes of the 16 channel Stage C and 4 channel Stage B latents of a plan for a batch."""
+    return batch_size * element_size * (16 * plan["c_width"] * plan["c_height"] + 4 * plan["b_width"] * plan["b_height"])
+
+def max_batch_size(plan, max_bytes, element_size=4):
+    """Largest batch of a plan's latents that fits in max_bytes, possibly 0."""
+    return int(max_bytes // latent_bytes(plan, 1, element_size))
+
+def estimate_cost(plan, batch_size=1, stage_c_model="big", stage_b_model="big", flops_per_second=None):
+    """Per sampling step cost of a batch of a plan's latents.
+
+    Returns tokens and GFLOPs per stage, the bytes of the latents themselves, and the
+    seconds per step of each stage when flops_per_second (see stable_cascade_costs) is
+    known, None otherwise. Multiply by the step count of each stage for a whole run.
+    """
+    stage_c_tokens = batch_size * plan["c_width"] * plan["c_height"]
+    stage_b_tokens = batch_size * -(-plan["b_width"] // STAGE_B_PATCH) * -(-plan["b_height"] // STAGE_B_PATCH)
+    stage_c_flops = 2 * MODEL_PARAMETERS["stage_c"][stage_c_model] * stage_c_tokens
+    stage_b_flops = 2 * MODEL_PARAMETERS["stage_b"][stage_b_model] * stage_b_tokens
+    return {
+        "batch_size": batch_size,
+        "stage_c_tokens": stage_c_tokens,
+        "stage_b_tokens": stage_b_tokens,
+        "stage_c_gflops": stage_c_flops / 1e9,
+        "stage_b_gflops": stage_b_flops / 1e9,
+        "latent_bytes": latent_bytes(plan, batch_size),
+        "stage_c_seconds": stage_c_flops / flops_per_second if flops_per_second else None,
+        "stage_b_seconds": stage_b_flops / flops_per_second if flops_per_second else None,
+    }
+
+def preset_planner(scale=1.0):
+    with _planners_lock:
+        if scale not in _preset_planners:
+            _preset_planners[scale] = PresetPlanner(scale)
+        return _preset_planners[scale]
+
+
+def adjust_to_mean(c_width, c_height, mean):
+    """Scale Stage C dimensions so they add up to exactly mean * 2."""
+    # Calculate the desired total dimension
+    target_total = mean * 2
+
+    # Calculate the scaling factor to achieve the target total dimension
+    scale_factor = target_total / (c_width + c_height)
+
+    # Adjust c_width and c_height based on the scaling factor
+    c_width = int(c_width * scale_factor)
+    c_height = int(c_height * scale_factor)
+
+    # Ensure the sum of c_width and c_height is exactly target_total
+    if c_width + c_height != target_total:
+        difference = target_total - (c_width + c_height)
+        # Adjust the larger dimension to account for rounding differences
+        if c_width > c_height:
+            c_width = int(c_width + difference)
+        else:
+            c_height = int(c_height + difference)
+
+    return c_width, c_height
+
+def pad_to_32(c_width, c_height):
+    """Scale Stage C dimensions up so the shortest edge is at least 32."""
+    shortest_edge = min(c_width, c_height)
+    if shortest_edge < 32:
+        padding_factor = (32 / shortest_edge)
+        c_width = int(c_width * padding_factor)
+        c_height = int(c_height * padding_factor)
+    return c_width, c_height
+
+def adjust_stage_c(plan, target_mean=False, mean=32, pad_shortest_to_32=False):
+    if target_mean:
+        plan["c_width"], plan["c_height"] = adjust_to_mean(plan["c_width"], plan["c_height"], mean)
+    if pad_shortest_to_32:
+        plan["c_width"], plan["c_height"] = pad_to_32(plan["c_width"], plan["c_height"])
+    return plan
+
+def plan_acf(acf, width, height, offset=0):
+    solve = incremental_planner(acf).update if _incremental.get() else acf.solve
+    compression, gap = solve(width, height)
+    return {
+        "compression": compression,
+        "gap": gap,
+        "c_width": (width // compression) + offset,
+        "c_height": (height // compression) + offset,
+        "b_width": width // 4,
+        "b_height": height // 4,
+    }
+
+def plan_preset(presets, width, height, offset=0, stage_b="pixels"):
+    """Preset aspect match; stage_b picks how the node family derives its Stage B size.
+
+        pixels            width // 4 (Basic nodes, WithVAE nodes)
+        compression_mean  c * mean compression, rounded up to 32 px (AutoResonance, AutoCascade1B)
+        latent_x8         c * 8 (Advanced nodes)
+    """
+    c_width, c_height = presets.match(width, height)
+    plan = {
+        "compression": None,
+        "gap": None,
+        "c_width": c_width + offset,
+        "c_height": c_height + offset,
+    }
+
+    if stage_b == "compression_mean":
+        compression_mean = ((width // plan["c_width"]) + (height // plan["c_height"])) / 2
+        plan["compression"] = compression_mean
+        plan["b_width"] = ensure_divisible_by_32(int(plan["c_width"] * compression_mean)) // 4
+        plan["b_height"] = ensure_divisible_by_32(int(plan["c_height"] * compression_mean)) // 4
+    elif stage_b == "latent_x8":
+        plan["b_width"] = plan["c_width"] * 8
+        plan["b_height"] = plan["c_height"] * 8
+    else:
+        plan["b_width"] = width // 4
+        plan["b_height"] = height // 4
+    return plan
+
+def plan_img2img_stage_b(plan, width, height, image_width, image_height):
+    """Stage B size of the WithVAE nodes when an image is encoded into a plan made for it."""
+    if image_width == width and image_height == height:
+        plan["b_width"] = image_width // 4
+        plan["b_height"] = image_height // 4
+    else:
+        # Scale the Stage C latent so its mean matches the mean of the configured dimensions
+        upscale_factor = ((width + height) / 2) / ((plan["c_width"] + plan["c_height"]) / 2)
+        plan["b_width"] = round_to_multiple(plan["c_width"] * upscale_factor, 32) // 4
+        plan["b_height"] = round_to_multiple(plan["c_height"] * upscale_factor, 32) // 4
+    return plan
+
+
+def _acf_node(model_size, method):
+    def plan(width, height, **options):
+        return plan_acf(model_acf_planner(model_size, method), width, height)
+    return plan
+
+def _preset_node(scale, stage_b, offset_input=False):
+    def plan(width, height, offset=0, **options):
+        return plan_preset(preset_planner(scale), width, height, offset if offset_input else 0, stage_b)
+    return plan
+
+def _plan_acf_custom(width, height, center_min=32, center_max=38.5, aspect_max=3.75, compression_max=128, method="plus", **options):
+    return plan_acf(acf_planner(center_min, center_max, aspect_max=aspect_max, compression_max=compression_max, method=method), width, height)
+
+def _with_image(plan_function):
+    # The WithVAE nodes plan Stage C from the input image when one is given
+    def plan(width, height, offset=0, target_mean=False, mean=32, pad_shortest_to_32=False, image_size=None, **options):
+        source_width, source_height = image_size if image_size else (width, height)
+        result = adjust_stage_c(plan_function(source_width, source_height, offset, target_mean, mean), target_mean, mean, pad_shortest_to_32)
+        if image_size:
+            plan_img2img_stage_b(result, width, height, source_width, source_height)
+        return result
+    return plan
+
+def _plan_autoresonance_acf(width, height, offset, target_mean, mean):
+    # Targeting a fixed mean is the same search with a flat aspect curve
+    acf = acf_planner(mean, mean, method="min") if target_mean else model_acf_planner("1024", "min")
+    return plan_acf(acf, width, height, offset)
+
+def _plan_autoresonance_advanced(width, height, offset, target_mean, mean):
+    return plan_preset(preset_planner(1.0), width, height, offset)
+
+
+# Dimension-only planning for every node type, keyed like NODE_CLASS_MAPPINGS
+NODE_PLANS = {
+    "SC_EmptyLatentImageACF_plus": _acf_node("1024", "plus"),
+    "SC_EmptyLatentImageACF_plus_768": _acf_node("768", "plus"),
+    "SC_EmptyLatentImageACF_plus_min": _acf_node("1024", "min"),
+    "SC_EmptyLatentImageACF_plus_min_768": _acf_node("768", "min"),
+    "SC_EmptyLatentImageACF_alt": _acf_node("1024", "alt"),
+    "SC_EmptyLatentImageACF_alt_768": _acf_node("768", "alt"),
+    "SC_EmptyLatentImageACF_custom": _plan_acf_custom,
+    "SC_EmptyLatentImageAutoResonance": _preset_node(1.0, "compression_mean"),
+    "SC_EmptyLatentImageAutoResonanceBasic": _preset_node(1.0, "pixels"),
+    "SC_EmptyLatentImageAutoResonanceAdvanced": _preset_node(1.0, "latent_x8", offset_input=True),
+    "SC_EmptyLatentImageAutoCascade1B": _preset_node(0.75, "compression_mean"),
+    "SC_EmptyLatentImageAutoCascade768Basic": _preset_node(0.75, "pixels"),
+    "SC_EmptyLatentImageAutoCascade768Advanced": _preset_node(0.75, "latent_x8", offset_input=True),
+    "AutoResonanceAdvancedACF": _with_image(_plan_autoresonance_acf),
+    "AutoResonanceAdvanced": _with_image(_plan_autoresonance_advanced),
+}
+
+# (min, max, step) of the width and height inputs of every node type
+SIZE_RANGES = {node_type: (512, 4096, 32) for node_type in NODE_PLANS}
+SIZE_RANGES.update({
+    "SC_EmptyLatentImageACF_plus_768": (384, 4096, 32),
+    "SC_EmptyLatentImageACF_plus_min_768": (384, 4096, 32),
+    "SC_EmptyLatentImageACF_alt_768": (384, 4096, 32),
+    "SC_EmptyLatentImageACF_custom": (256, 4096, 32),
+})
+OFFSET_RANGE = (-16, 16)
+
+def check_inputs(node_type, width, height, offset=0):
+    """Raise ValueError unless the node's width, height and offset inputs accept these values."""
+    if node_type not in SIZE_RANGES:
+        raise ValueError(f"Unknown node type: {node_type}")
+    low, high, step = SIZE_RANGES[node_type]
+    for name, value in (("width", width), ("height", height)):
+        if not low <= value <= high or value % step:
+            raise ValueError(f"{name} must be a multiple of {step} from {low} to {high}, got {value}")
+    if not OFFSET_RANGE[0] <= offset <= OFFSET_RANGE[1]:
+        raise ValueError(f"offset must be from {OFFSET_RANGE[0]} to {OFFSET_RANGE[1]}, got {offset}")
+
+# Strategies of the unified SC_LatentPlanner node, each planning like the legacy node it names
+STRATEGIES = {
+    "acf_plus": "SC_EmptyLatentImageACF_plus",
+    "acf_plus_768": "SC_EmptyLatentImageACF_plus_768",
+    "acf_min": "SC_EmptyLatentImageACF_plus_min",
+    "acf_min_768": "SC_EmptyLatentImageACF_plus_min_768",
+    "acf_alt": "SC_EmptyLatentImageACF_alt",
+    "acf_alt_768": "SC_EmptyLatentImageACF_alt_768",
+    "acf_custom": "SC_EmptyLatentImageACF_custom",
+    "autoresonance": "SC_EmptyLatentImageAutoResonance",
+    "autoresonance_basic": "SC_EmptyLatentImageAutoResonanceBasic",
+    "autoresonance_advanced": "SC_EmptyLatentImageAutoResonanceAdvanced",
+    "autocascade_1b": "SC_EmptyLatentImageAutoCascade1B",
+    "autocascade_768_basic": "SC_EmptyLatentImageAutoCascade768Basic",
+    "autocascade_768_advanced": "SC_EmptyLatentImageAutoCascade768Advanced",
+    "autoresonance_acf_vae": "AutoResonanceAdvancedACF",
+    "autoresonance_advanced_vae": "AutoResonanceAdvanced",
+}
+
+# Node types that plan from the encoded image themselves when given image_size
+IMAGE_PLANS = ("AutoResonanceAdvancedACF", "AutoResonanceAdvanced")
+
+STAGE_B = StageBPlanner()
+
+_plan_cache = {}
+
+def plan_dimensions(node_type, width, height, stage_b="node", max_stage_b_pixels=None, **options):
+    """Plan the Stage C and Stage B latent sizes a node would produce, without allocating.
+
+    Returns a dict with c_width, c_height, b_width, b_height, compression and gap
+    (None where the node does not search compression factors), and the preflight warnings
+    of check_stage_b(). Options are the node's other inputs, plus image_size=(width, height)
+    for the image path of the WithVAE nodes. stage_b="solver" replaces the node's own
+    Stage B rule with the closest valid size from STAGE_B, optionally capped at
+    max_stage_b_pixels. Plans are cached, so callers get a copy they are free to modify.
+    """
+    key = (node_type, width, height, stage_b, max_stage_b_pixels, tuple(sorted(options.items())))
+    plan = _plan_cache.get(key)
+    if plan is None:
+        if node_type not in NODE_PLANS:
+            raise ValueError(f"Unknown node type: {node_type}")
+        plan = NODE_PLANS[node_type](width, height, **options)
+        if stage_b == "solver":
+            plan["b_width"], plan["b_height"] = STAGE_B.closest(plan["c_width"], plan["c_height"], width, height, max_stage_b_pixels)
+        elif stage_b != "node":
+            raise ValueError(f"Unknown Stage B rule: {stage_b}")
+        plan["warnings"] = tuple(check_stage_b(plan))
+        if len(_plan_cache) >= CACHE_LIMIT:
+            _plan_cache.clear()
+        _plan_cache[key] = plan
+    return dict(plan)
+
+# Weights of the cost terms of plan_cost() when a caller does not give its own
+SCORE_WEIGHTS = {"aspect": 1.0, "compute": 0.0, "mean": 0.25, "stage_b": 1.0}
+
+# Shortest Stage C side score_plans() accepts. Offsets and padding can squeeze a plan far
+# below anything Stage C generates well, and such a plan can still score well on aspect.
+MIN_STAGE_C_SIDE = 8
+
+def plan_cost(plan, width, height, mean=32):
+    """Unweighted cost terms of a plan for a width x height request.
+
+        aspect   |log| of the Stage C aspect over the requested aspect
+        compute  Stage C tokens relative to a mean x mean latent
+        mean     distance of the Stage C mean side to mean, relative to mean
+        stage_b  number of Stage B constraints the plan breaks, see stage_b_problems()
+    """
+    c_width, c_height = plan["c_width"], plan["c_height"]
+    if min(c_width, c_height) <= 0:
+        return {"aspect": math.inf, "compute": math.inf, "mean": math.inf, "stage_b": 1}
+    return {
+        "aspect": abs(math.log((c_width / c_height) / (width / height))),
+        "compute": c_width * c_height / (mean * mean),
+        "mean": abs((c_width + c_height) / 2 - mean) / mean,
+        "stage_b": len(stage_b_problems(c_width, c_height, plan["b_width"], plan["b_height"])),
+    }
+
+def score_plan(plan, width, height, weights=None, mean=32):
+    weights = SCORE_WEIGHTS if weights is None else {**SCORE_WEIGHTS, **weights}
+    terms = plan_cost(plan, width, height, mean)
+    return sum(weights[term] * value for term, value in terms.items() if weights[term])
+
+def plan_strategy(strategy, width, height, image_size=None, **options):
+    """Plan of a SC_LatentPlanner strategy for a width x height request.
+
+    options are the node inputs, passed on like the legacy node gets them. With the
+    image_size of an encoded image the WithVAE strategies plan from the image for width x
+    height themselves, while the others simply plan for the image size.
+    """
+    node_type = STRATEGIES.get(strategy)
+    if node_type is None:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    if node_type in IMAGE_PLANS:
+        return plan_dimensions(node_type, width, height, image_size=image_size, **options)
+    return plan_dimensions(node_type, *(image_size or (width, height)), **options)
+
+def score_plans(width, height, weights=None, mean=32, strategies=None, image_size=None, **options):
+    """Plan width x height with every strategy and score the plans, best first.
+
+    Returns (score, strategy, plan) tuples sorted by score, the weighted sum of the
+    plan_cost() terms; weights overrides entries of SCORE_WEIGHTS. Besides STRATEGIES the
+    candidates include "target_mean", the ACF image plan scaled to a Stage C mean of mean.
+    Every strategy plans through plan_strategy() with image_size and the other node inputs
+    in options, and is scored against the size it planned for, the image size if any.
+    Strategies that plan identical shapes are scored once, under the first of them. Every
+    plan comes from the plan_dimensions() cache, so repeated requests only pay for scoring.
+    Candidates that fail to plan with these inputs, or plan a Stage C side under
+    MIN_STAGE_C_SIDE or an empty Stage B, are left out; ValueError if none is left.
+    """
+    planned_width, planned_height = image_size or (width, height)
+    scored = []
+    seen = set()
+    for strategy in (list(STRATEGIES) + ["target_mean"] if strategies is None else strategies):
+        if strategy != "target_mean" and strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        try:
+            if strategy == "target_mean":
+                plan = plan_strategy("autoresonance_acf_vae", width, height, image_size, **{**options, "target_mean": True, "mean": mean})
+            else:
+                plan = plan_strategy(strategy, width, height, image_size, mean=mean, **options)
+        except (ArithmeticError, ValueError):
+            # e.g. padding a Stage C latent that an offset shrank to nothing
+            continue
+        if min(plan["c_width"], plan["c_height"]) < MIN_STAGE_C_SIDE or min(plan["b_width"], plan["b_height"]) <= 0:
+            continue
+        shape = (plan["c_width"], plan["c_height"], plan["b_width"], plan["b_height"])
+        if shape in seen:
+            continue
+        seen.add(shape)
+        scored.append((score_plan(plan, planned_width, planned_height, weights, mean), strategy, plan))
+    if not scored:
+        raise ValueError(f"No strategy plans a usable latent for {width}x{height} with these inputs")
+    # Stable, so ties keep the order of STRATEGIES
+    scored.sort(key=lambda entry: entry[0])
+    return scored
+
@@ -0,0 +1,78 @@
+import math
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_planner
+import stable_cascade_costs
+
+# Dimension preview for the frontend: POST /sc_planner/preview with either one query
+#   {"node": "SC_EmptyLatentImageACF_plus", "width": 1024, "height": 1536, "options": {"offset": 0}}
+# or many at once as {"queries": [...]}, and get the planned latent sizes back without
+# queueing a prompt or allocating anything. A bad query gets an "error" entry of its own
+# so one typo does not fail the whole batch. A query with a "batch_size" also gets the
+# "cost" of sampling that batch from stable_cascade_costs, to turn away requests over
+# budget before they are queued. Sizes are checked against the node's own inputs, and a
+# request holds at most MAX_QUERIES queries, so callers cannot plan arbitrary shapes.
+MAX_QUERIES = 1024
+MAX_IMAGE_SIDE = 16384
+
+def preview(query):
+    try:
+        node_type, width, height = query["node"], int(query["width"]), int(query["height"])
+        options = dict(query.get("options") or {})
+        stable_cascade_planner.check_inputs(node_type, width, height, int(options.get("offset", 0)))
+        if options.get("image_size") is not None:
+            options["image_size"] = tuple(int(side) for side in options["image_size"])
+            if len(options["image_size"]) != 2 or not all(0 < side <= MAX_IMAGE_SIDE for side in options["image_size"]):
+                raise ValueError(f"image_size must be two sides from 1 to {MAX_IMAGE_SIDE}, got {query['options']['image_size']}")
+        # Successive queries usually come from a dragged slider
+        with stable_cascade_planner.incremental_search():
+            plan = stable_cascade_planner.plan_dimensions(node_type, width, height, **options)
+        if query.get("batch_size") is not None:
+            plan["cost"] = stable_cascade_costs.estimate(plan, int(query["batch_size"]))
+    except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+        # ArithmeticError: some option combinations divide by a zero-sized latent
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    # JSON has no infinity; an infinite gap means no ACF compression matched (fallback of 32)
+    if isinstance(plan["gap"], float) and math.isinf(plan["gap"]):
+        plan["gap"] = None
+    return plan
+
+def preview_batch(body):
+    """Results of a single query or of {"queries": [...]}; raises ValueError for a bad batch."""
+    if isinstance(body, dict) and "queries" in body:
+        queries = body["queries"]
+        if not isinstance(queries, list) or len(queries) > MAX_QUERIES:
+            raise ValueError(f"queries must be a list of at most {MAX_QUERIES} queries")
+        return {"results": [preview(query) for query in queries]}
+    return preview(body)
+
+
+try:
+    import server
+    from aiohttp import web
+
+    routes = server.PromptServer.instance.routes
+
+    @routes.post("/sc_planner/preview")
+    async def preview_route(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "Request body must be JSON"}, status=400)
+        if not isinstance(body, dict):
+            return web.json_response({"error": "Expected a query object or {\"queries\": [...]}"}, status=400)
+        try:
+            return web.json_response(preview_batch(body))
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+
+    @routes.get("/sc_planner/nodes")
+    async def nodes_route(request):
+        return web.json_response({"nodes": sorted(stable_cascade_planner.NODE_PLANS), "strategies": stable_cascade_planner.STRATEGIES})
+except (ImportError, AttributeError):
+    # Imported outside a running ComfyUI server; preview() is still usable directly
+    pass
+
+NODE_CLASS_MAPPINGS = {}
@@ -0,0 +1,328 @@
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import torch
+import comfy.model_management
+import comfy.utils
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import stable_cascade_paths
+
+# The img2img side of the WithVAE nodes: resizing the input image to the planned latent
+# size, and encoding it, optionally sharded across VAE replicas.
+
+# Resize engines. bicubic is the original common_upscale call and stays the default. The
+# others are antialiased, and for downscales of 2x or more they first shrink by the largest
+# integer factor with average pooling, so the final filter only covers the remaining
+# fraction. Pooling reads every input pixel once, where an antialiased filter over the full
+# ratio reads each one many times.
+RESIZE_METHODS = ["bicubic", "area", "bilinear_aa", "bicubic_aa", "lanczos"]
+
+# Optional reduced precision for the resize. NHWC inputs are already channels-last
+# once viewed as NCHW, so the resize reads them in place and its output moves back to NHWC
+# without a copy; casting halves the bytes the resize reads and writes. Measured against
+# fp32 bicubic on images in [0, 1]: fp16 stays within 2e-3, bf16 within 1e-2.
+RESIZE_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+# How the image is fitted to the latent. match_image plans the latent from the image itself,
+# so the center crop only trims rounding. The others plan from the node's width and height
+# and fit the image into that: cropping (a view, no copy) to the center or to the most
+# detailed window, letterboxing into a grey-filled output, or stretching. latent_letterbox
+# encodes only the image and pads its latent with the latent of a grey patch, so the VAE
+# never sees the border.
+FIT_MODES = ["match_image", "center_crop", "smart_crop", "letterbox", "latent_letterbox", "stretch"]
+
+def center_crop(samples, width, height):
+    """View of NCHW samples cropped to the aspect of width x height, as common_upscale crops."""
+    old_width = samples.shape[-1]
+    old_height = samples.shape[-2]
+    old_aspect = old_width / old_height
+    new_aspect = width / height
+    x = 0
+    y = 0
+    if old_aspect > new_aspect:
+        x = round((old_width - old_width * (new_aspect / old_aspect)) / 2)
+    elif old_aspect < new_aspect:
+        y = round((old_height - old_height * (old_aspect / new_aspect)) / 2)
+    return samples.narrow(-2, y, old_height - y * 2).narrow(-1, x, old_width - x * 2)
+
+def smart_crop(samples, width, height):
+    """View of NCHW samples cropped to the aspect of width x height where there is most detail.
+
+    Detail is the gradient magnitude along the cropped axis of a small luminance copy,
+    summed over the batch so every frame gets the same window.
+    """
+    old_width = samples.shape[-1]
+    old_height = samples.shape[-2]
+    crop_width = min(old_width, round(old_height * width / height))
+    crop_height = min(old_height, round(old_width * height / width))
+    if crop_width == old_width and crop_height == old_height:
+        return samples
+
+    factor = max(1, max(old_width, old_height) // 256)
+    small = torch.nn.functional.avg_pool2d(samples, factor) if factor > 1 else samples
+    luma = small.float().mean(1)
+    if crop_width < old_width:
+        axis, length, crop = -1, old_width, crop_width
+        energy = (luma[:, :, 1:] - luma[:, :, :-1]).abs().sum((0, 1))
+    else:
+        axis, length, crop = -2, old_height, crop_height
+        energy = (luma[:, 1:, :] - luma[:, :-1, :]).abs().sum((0, 2))
+
+    # Sliding window sums over the detail profile, in pooled units
+    window = max(1, min(round(crop / factor), energy.shape[0]))
+    totals = torch.nn.functional.pad(energy.cumsum(0), (1, 0))
+    start = int((totals[window:] - totals[:-window]).argmax()) * factor
+    return samples.narrow(axis, min(start, length - crop), crop)
+
+def preshrink(samples, width, height):
+    factor = int(min(samples.shape[-1] / width, samples.shape[-2] / height))
+    if factor < 2:
+        return samples
+    return torch.nn.functional.avg_pool2d(samples, factor)
+
+def resize(image, width, height, method="bicubic", precision="fp32", fit="match_image", grey_value=0.5):
+    """Resize an NHWC IMAGE batch to width x height, fitting it to the target aspect by fit."""
+    samples = image.movedim(-1, 1)  # Move the channel dimension
+    if precision in RESIZE_DTYPES:
+        samples = samples.to(RESIZE_DTYPES[precision])
+
+    if fit == "letterbox":
+        # Resample straight into the centered window of a grey-filled output, so the
+        # padded image is never built separately
+        scale = min(width / samples.shape[-1], height / samples.shape[-2])
+        inner_width = max(1, round(samples.shape[-1] * scale))
+        inner_height = max(1, round(samples.shape[-2] * scale))
+        top = (height - inner_height) // 2
+        left = (width - inner_width) // 2
+        output = torch.full([samples.shape[0], height, width, samples.shape[1]], grey_value, dtype=samples.dtype, device=samples.device)
+        output[:, top:top + inner_height, left:left + inner_width] = resample(samples, inner_width, inner_height, method).movedim(1, -1)
+        return output
+
+    if fit == "smart_crop":
+        samples = smart_crop(samples, width, height)
+    elif fit != "stretch":
+        samples = center_crop(samples, width, height)
+    return resample(samples, width, height, method).movedim(1, -1)
+
+def resample(samples, width, height, method="bicubic"):
+    """Resample NCHW samples to exactly width x height with one of RESIZE_METHODS."""
+    if method == "bicubic":
+        return comfy.utils.common_upscale(samples, width, height, "bicubic", "disabled")
+
+    samples = preshrink(samples, width, height)
+    if samples.shape[-2:] == (height, width):
+        resized = samples
+    elif method == "lanczos":
+        # ComfyUI's lanczos resamples through numpy and PIL, which only take float32
+        resized = comfy.utils.common_upscale(samples.float(), width, height, "lanczos", "disabled").to(samples.dtype)
+    elif method == "area":
+        resized = torch.nn.functional.interpolate(samples, size=(height, width), mode="area")
+    elif samples.device.type == "cpu" and samples.dtype != torch.float32:
+        # Antialiased kernels on CPU only exist for float32; the pooling above still ran in
+        # reduced precision, which is where the bulk of the bytes are
+        resized = torch.nn.functional.interpolate(samples.float(), size=(height, width), mode=method[:-len("_aa")], antialias=True).to(samples.dtype)
+    else:
+        resized = torch.nn.functional.interpolate(samples, size=(height, width), mode=method[:-len("_aa")], antialias=True)
+    return resized
+
+
+class ConstantLatentTable:
+    """Latent a solid colour encodes to, per VAE and RGB value, kept on disk.
+
+    Each entry costs one encode of a size x size latent patch, the first time a VAE sees
+    a colour; after that solid fills never go through the encoder again, across restarts.
+    The table is one JSON file per VAE fingerprint in directory, or memory only when
+    directory is empty. Configured with SC_LATENT_CACHE_DIR (default latent_cache in
+    stable_cascade_paths.data_directory()).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.fingerprints = weakref.WeakKeyDictionary()
+
+    def fingerprint(self, vae):
+        if vae not in self.fingerprints:
+            self.fingerprints[vae] = vae_fingerprint(vae)
+        return self.fingerprints[vae]
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, f"{fingerprint}.json")
+
+    def table(self, fingerprint):
+        if fingerprint not in self.tables:
+            table = {}
+            if self.directory and os.path.exists(self.path(fingerprint)):
+                with open(self.path(fingerprint), "r") as f:
+                    table = json.load(f)
+            self.tables[fingerprint] = table
+        return self.tables[fingerprint]
+
+    def save(self, fingerprint):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.path(fingerprint) + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.tables[fingerprint], f)
+        os.replace(temp_path, self.path(fingerprint))
+
+    def get(self, vae, rgb, size=4):
+        """[1, C, 1, 1] latent of a solid rgb image, values in [0, 1]."""
+        key = ",".join(f"{float(value):.4f}" for value in rgb)
+        with self.lock:
+            fingerprint = self.fingerprint(vae)
+            table = self.table(fingerprint)
+            if key not in table:
+                patch = torch.tensor([float(value) for value in rgb]).expand(1, size * vae.downscale_ratio, size * vae.downscale_ratio, 3).contiguous()
+                latent = encode_locked(vae, patch)
+                # Interior latent pixels are free of the encoder's border effects
+                table[key] = latent[:, :, 1:-1, 1:-1].float().mean((0, 2, 3)).tolist()
+                self.save(fingerprint)
+            return torch.tensor(table[key]).view(1, -1, 1, 1)
+
+
+def vae_fingerprint(vae):
+    """Short hash identifying a VAE's weights, from every tensor's name, shape and a strided sample."""
+    digest = hashlib.sha256(f"{type(vae).__name__}:{vae.downscale_ratio}".encode())
+    model = getattr(vae, "first_stage_model", None)
+    if model is not None:
+        for name, tensor in sorted(model.state_dict().items()):
+            flat = tensor.detach().flatten()
+            sample = flat[::max(1, flat.numel() // 64)][:64]
+            digest.update(f"{name}:{tuple(tensor.shape)}:{sample.float().cpu().tolist()}".encode())
+    return digest.hexdigest()[:16]
+
+CONSTANT_LATENTS = ConstantLatentTable(os.environ.get("SC_LATENT_CACHE_DIR", stable_cascade_paths.data_path("latent_cache")))
+
+def constant_latent(vae, rgb, size=4):
+    """[1, C, 1, 1] latent of a solid rgb image, from CONSTANT_LATENTS."""
+    return CONSTANT_LATENTS.get(vae, rgb, size)
+
+def solid_latent(vae, rgb, batch_size, width, height):
+    """Stage C latent of a solid rgb image of width x height latent pixels, without encoding it."""
+    return constant_latent(vae, rgb).expand(batch_size, -1, height, width).clone()
+
+def encode_letterboxed(vae, image, width, height, grey_value=0.5, method="bicubic", precision="fp32", workers=1):
+    """Stage C latent of image letterboxed into width x height latent pixels.
+
+    Only the image is encoded, at the largest size that fits, and the latent is padded with
+    constant_latent() of the grey, so the border costs no VAE compute.
+    """
+    scale = min(width / image.shape[-2], height / image.shape[-3])
+    inner_width = max(1, min(width, round(image.shape[-2] * scale)))
+    inner_height = max(1, min(height, round(image.shape[-3] * scale)))
+    resized_image = resize(image, inner_width * vae.downscale_ratio, inner_height * vae.downscale_ratio, method, precision, "center_crop")
+    latent = encode(vae, resized_image, workers)
+
+    output = solid_latent(vae, (grey_value,) * 3, latent.shape[0], width, height).to(latent)
+    top = (height - latent.shape[-2]) // 2
+    left = (width - latent.shape[-1]) // 2
+    output[:, :, top:top + latent.shape[-2], left:left + latent.shape[-1]] = latent
+    return output
+
+
+# Sharded encoding: a large image batch is split into contiguous shards, one per device,
+# each encoded by a VAE replica on that device from its own thread, and the latents are
+# gathered back in batch order. Torch releases the GIL inside its kernels, so the devices
+# run concurrently. A single device already runs one encode on all of its cores or SMs, so
+# there the VAE is shared rather than copied, which would only duplicate its weights.
+
+# Replicas are kept per VAE and device for reuse between executions and dropped with the
+# VAE. Only the copies are stored, the original is always replica 0 on its own device.
+_replicas = weakref.WeakKeyDictionary()
+_replicas_lock = threading.Lock()
+
+# comfy.model_management tracks the loaded models in module globals that are not safe to
+# update from several threads. ComfyUI's VAE.encode() loads its model on every call, so the
+# threads never call it: the replicas are loaded together under this lock first, and each
+# shard then runs through the replica's first stage model directly (encode_loaded()).
+_load_lock = threading.Lock()
+
+def shard_ranges(batch_size, shards):
+    """Contiguous (start, end) ranges splitting batch_size into at most shards parts."""
+    shards = max(1, min(shards, batch_size))
+    size, extra = divmod(batch_size, shards)
+    ranges = []
+    start = 0
+    for index in range(shards):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def replica_devices():
+    # Every CUDA device when there are several, otherwise none besides the VAE's own
+    if torch.cuda.device_count() > 1:
+        return [torch.device("cuda", index) for index in range(torch.cuda.device_count())]
+    return []
+
+def place_replica(replica, device):
+    # ComfyUI VAEs move their inputs to .device and load their weights through a
+    # ModelPatcher onto its load_device
+    replica.device = device
+    if hasattr(replica, "patcher"):
+        replica.patcher.load_device = device
+    return replica
+
+def vae_replicas(vae, count):
+    """Up to count VAEs on distinct devices: vae itself followed by copies on other devices."""
+    devices = [device for device in replica_devices() if device != getattr(vae, "device", None)][:count - 1]
+    with _replicas_lock:
+        copies = _replicas.setdefault(vae, {})
+        for device in devices:
+            if device not in copies:
+                copies[device] = place_replica(copy.deepcopy(vae), device)
+        return [vae] + [copies[device] for device in devices]
+
+def load_replicas(replicas, shard):
+    # Loads every replica with room to encode shard, one NHWC shard of the batch
+    patchers = [replica.patcher for replica in replicas if hasattr(replica, "patcher")]
+    if patchers:
+        memory_required = replicas[0].memory_used_encode(shard.movedim(-1, 1).shape, replicas[0].vae_dtype)
+        with _load_lock:
+            comfy.model_management.load_models_gpu(patchers, memory_required=memory_required)
+
+def encode_loaded(replica, pixels):
+    """replica.encode(pixels) for a replica load_replicas() loaded, without loading it again.
+
+    Follows ComfyUI's VAE.encode(): crop, process_input and encode in batches that fit the
+    free memory of the replica's device.
+    """
+    samples = replica.vae_encode_crop_pixels(pixels).movedim(-1, 1)
+    memory_used = replica.memory_used_encode(samples.shape, replica.vae_dtype)
+    batch_size = max(1, int(comfy.model_management.get_free_memory(replica.device) / max(1, memory_used)))
+    latents = []
+    for start in range(0, samples.shape[0], batch_size):
+        batch = replica.process_input(samples[start:start + batch_size]).to(replica.vae_dtype).to(replica.device)
+        latents.append(replica.first_stage_model.encode(batch).to(replica.output_device).float())
+    return torch.cat(latents)
+
+def encode_locked(replica, pixels):
+    # Encodes that load their model themselves run one at a time: unsharded ones, which may
+    # race with the shards of a concurrent execution, and VAEs not laid out like ComfyUI's
+    with _load_lock:
+        return replica.encode(pixels)
+
+def encode(vae, pixels, workers=1):
+    """vae.encode(pixels), sharded over the batch across VAE replicas on up to workers devices."""
+    replicas = vae_replicas(vae, min(workers, pixels.shape[0]))
+    if len(replicas) == 1:
+        return encode_locked(vae, pixels)
+
+    ranges = shard_ranges(pixels.shape[0], len(replicas))
+    if all(hasattr(replica, "first_stage_model") for replica in replicas):
+        load_replicas(replicas, pixels[:ranges[0][1]])
+        encode_shard = encode_loaded
+    else:
+        encode_shard = encode_locked
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(encode_shard, replica, pixels[start:end]) for replica, (start, end) in zip(replicas, ranges)]
+        latents = [future.result() for future in futures]
+    return torch.cat([latent.to(latents[0].device) for latent in latents])
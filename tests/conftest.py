@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The nodes import ComfyUI modules at the top; tests/stubs has minimal CPU stand-ins for
+# them, so the suite runs with torch alone: python -m pytest tests
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path[:0] = [os.path.join(TESTS_DIR, "stubs"), os.path.dirname(TESTS_DIR)]
+
+# Keep files the modules write by default out of the user's directories
+os.environ.setdefault("SC_LATENT_CACHE_DIR", "")
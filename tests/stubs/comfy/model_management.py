@@ -0,0 +1,15 @@
+import torch
+
+# CPU-only stand-in for comfy.model_management
+
+def get_torch_device():
+    return torch.device("cpu")
+
+def intermediate_device():
+    return torch.device("cpu")
+
+def get_free_memory(dev=None, torch_free_too=False):
+    return 8 * 1024 ** 3
+
+def load_models_gpu(models, memory_required=0, force_patch_weights=False, minimum_memory_required=None, force_full_load=False):
+    pass
@@ -0,0 +1,26 @@
+import torch
+
+# Stand-in for comfy.utils with the same center crop as ComfyUI's common_upscale
+
+def common_upscale(samples, width, height, upscale_method, crop):
+    if crop == "center":
+        old_width = samples.shape[-1]
+        old_height = samples.shape[-2]
+        old_aspect = old_width / old_height
+        new_aspect = width / height
+        x = 0
+        y = 0
+        if old_aspect > new_aspect:
+            x = round((old_width - old_width * (new_aspect / old_aspect)) / 2)
+        elif old_aspect < new_aspect:
+            y = round((old_height - old_height * (old_aspect / new_aspect)) / 2)
+        samples = samples.narrow(-2, y, old_height - y * 2).narrow(-1, x, old_width - x * 2)
+    if upscale_method == "lanczos":
+        # ComfyUI's lanczos goes through numpy and PIL, which fail on bf16 and want float32
+        if samples.dtype != torch.float32:
+            raise TypeError(f"lanczos needs float32 samples, got {samples.dtype}")
+        upscale_method = "bicubic"
+    return torch.nn.functional.interpolate(samples, size=(height, width), mode=upscale_method)
+
+def load_torch_file(path):
+    return torch.load(path)
@@ -0,0 +1 @@
+# Stand-in for ComfyUI's nodes module, imported but not used by the latent nodes
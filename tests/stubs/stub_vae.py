@@ -0,0 +1,47 @@
+import torch
+
+import comfy.model_management
+
+class StubVAE:
+    """Deterministic stand-in for the Stage C encoder: 32x average pooling to 16 channels."""
+
+    downscale_ratio = 32
+
+    def encode(self, pixels):
+        x = torch.nn.functional.avg_pool2d(pixels.movedim(-1, 1).float(), self.downscale_ratio)
+        return x.repeat(1, 6, 1, 1)[:, :16]
+
+
+class Patcher:
+    def __init__(self, device):
+        self.load_device = device
+
+class FirstStage(torch.nn.Module):
+    def encode(self, x):
+        x = torch.nn.functional.avg_pool2d(x, 32)
+        return x.repeat(1, 6, 1, 1)[:, :16]
+
+class ComfyStubVAE(StubVAE):
+    """StubVAE laid out like ComfyUI's VAE, whose encode() loads the model on every call."""
+
+    vae_dtype = torch.float32
+    output_device = torch.device("cpu")
+
+    def __init__(self, device=torch.device("cpu")):
+        self.device = device
+        self.patcher = Patcher(device)
+        self.first_stage_model = FirstStage()
+
+    def vae_encode_crop_pixels(self, pixels):
+        return pixels
+
+    def process_input(self, image):
+        return image * 2 - 1
+
+    def memory_used_encode(self, shape, dtype):
+        return 1767 * shape[2] * shape[3] * 4
+
+    def encode(self, pixels):
+        comfy.model_management.load_models_gpu([self.patcher], memory_required=self.memory_used_encode(pixels.movedim(-1, 1).shape, self.vae_dtype))
+        samples = self.process_input(pixels.movedim(-1, 1)).to(self.vae_dtype).to(self.device)
+        return self.first_stage_model.encode(samples).to(self.output_device).float()
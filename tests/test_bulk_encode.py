@@ -0,0 +1,106 @@
+import json
+import os
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from stub_vae import StubVAE
+import stable_cascade_BulkEncode as bulk
+import stable_cascade_paths
+
+
+def latents(*shapes):
+    generator = torch.Generator().manual_seed(0)
+    return [torch.randn(shape, generator=generator) for shape in shapes]
+
+def read_index(output_dir):
+    with open(os.path.join(output_dir, bulk.INDEX_NAME), "r") as f:
+        return json.load(f)
+
+
+def test_shards_round_trip(tmp_path):
+    written = latents([1, 16, 32, 32], [1, 16, 24, 40], [2, 16, 20, 48], [1, 16, 32, 32])
+    # Small enough that every latent starts a new shard
+    writer = bulk.ShardWriter(str(tmp_path), 64 * 1024)
+    for index, latent in enumerate(written):
+        writer.add(f"image_{index}.png", latent, (1024, 1024))
+    writer.close()
+
+    index = read_index(tmp_path)
+    assert len(index["shards"]) == len(written)
+    reader = bulk.LatentShardReader(str(tmp_path))
+    assert reader.names() == [f"image_{index}.png" for index in range(len(written))]
+    for index, latent in enumerate(written):
+        assert torch.equal(reader.load(f"image_{index}.png")["samples"], latent)
+
+def test_resume_drops_unindexed_data(tmp_path):
+    first, second, third = latents([1, 16, 32, 32], [1, 16, 24, 40], [1, 16, 20, 48])
+    writer = bulk.ShardWriter(str(tmp_path), 1024 * 1024)
+    writer.add("a.png", first, (1024, 1024))
+    writer.add("b.png", second, (960, 768))
+    writer.flush()
+    # Interrupted after the data of c.png reached the shard but before the index did
+    writer.add("c.png", third, (1536, 640))
+    writer.handle.close()
+
+    shard = os.path.join(tmp_path, sorted(read_index(tmp_path)["shards"])[-1])
+    indexed_size = read_index(tmp_path)["shards"][os.path.basename(shard)]
+    assert os.path.getsize(shard) > indexed_size
+
+    resumed = bulk.ShardWriter(str(tmp_path), 1024 * 1024, resume=True)
+    assert os.path.getsize(shard) == indexed_size
+    assert resumed.contains("a.png") and resumed.contains("b.png")
+    assert not resumed.contains("c.png")
+    resumed.add("c.png", third, (1536, 640))
+    resumed.close()
+
+    reader = bulk.LatentShardReader(str(tmp_path))
+    for name, latent in (("a.png", first), ("b.png", second), ("c.png", third)):
+        assert torch.equal(reader.load(name)["samples"], latent)
+
+def test_bulk_encode_with_stub_vae(tmp_path):
+    input_dir = tmp_path / "images"
+    output_dir = tmp_path / "latents"
+    input_dir.mkdir()
+    rng = np.random.default_rng(0)
+    for name, (width, height) in (("square.png", (512, 512)), ("wide.png", (768, 384)), ("tall.jpg", (384, 640))):
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)).save(input_dir / name)
+
+    node = bulk.AutoResonanceBulkEncode()
+    index_path, = node.bulk_encode(StubVAE(), str(input_dir), str(output_dir), shard_size_mb=1)
+
+    reader = bulk.LatentShardReader(str(output_dir))
+    assert sorted(reader.names()) == ["square.png", "tall.jpg", "wide.png"]
+    for name in reader.names():
+        entry = reader.index["entries"][name]
+        c_width, c_height = node.plan(*entry["source_size"])
+        image = bulk.load_image(str(input_dir / name))
+        expected = node.encode_image(image, StubVAE())
+        assert entry["shape"] == [1, 16, c_height, c_width]
+        assert torch.equal(reader.load(name)["samples"], expected)
+
+    # A second run finds everything already encoded
+    node.bulk_encode(StubVAE(), str(input_dir), str(output_dir), shard_size_mb=1)
+    assert bulk.LatentShardReader(str(output_dir)).index == reader.index
+
+def test_bulk_encode_rejects_other_vaes(tmp_path):
+    class StageAVAE(StubVAE):
+        downscale_ratio = 4
+
+    with pytest.raises(ValueError, match="downscale_ratio"):
+        bulk.AutoResonanceBulkEncode().bulk_encode(StageAVAE(), str(tmp_path), str(tmp_path / "latents"))
+
+def test_node_confines_directories(monkeypatch, tmp_path):
+    directories = {"input": tmp_path / "input", "output": tmp_path / "output"}
+    for directory in directories.values():
+        directory.mkdir()
+    Image.new("RGB", (64, 96)).save(directories["input"] / "a.png")
+    monkeypatch.setattr(stable_cascade_paths, "comfy_directory", lambda kind: str(directories[kind]))
+    node = bulk.AutoResonanceBulkEncode()
+
+    index_path, = node.encode_node(StubVAE(), "", "latents")
+    assert index_path == str(directories["output"] / "latents" / bulk.INDEX_NAME)
+    for input_dir, output_dir in [("..", "latents"), ("", "../latents"), ("", str(tmp_path))]:
+        with pytest.raises(ValueError, match="outside"):
+            node.encode_node(StubVAE(), input_dir, output_dir)
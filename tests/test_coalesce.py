@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+import torch
+
+import stable_cascade_coalesce as coalesce
+import stable_cascade_latents
+import stable_cascade_planner
+
+
+def serve(coalescer, *requests):
+    async def run():
+        return await asyncio.gather(*(coalescer.request(*args, **options) for args, options in requests))
+    return asyncio.run(run())
+
+def alone(node_type, width, height, batch_size, init, seed):
+    plan = stable_cascade_planner.plan_dimensions(node_type, width, height)
+    return (stable_cascade_latents.initial_latents([batch_size], 16, plan["c_height"], plan["c_width"], "stage_c", init, seed)[0],
+            stable_cascade_latents.initial_latents([batch_size], 4, plan["b_height"], plan["b_width"], "stage_b", init, seed)[0])
+
+def test_same_shapes_share_one_batch():
+    coalescer = coalesce.LatentCoalescer(window=0.05)
+    # Both nodes plan 1024x1024 to the same shapes
+    results = serve(coalescer,
+                    (("SC_EmptyLatentImageACF_plus", 1024, 1024, 2), {}),
+                    (("SC_EmptyLatentImageAutoResonance", 1024, 1024, 3), {}),
+                    (("SC_EmptyLatentImageACF_plus", 1024, 1024, 1), {}))
+    assert coalescer.stats == {"requests": 3, "groups": 1, "samples": 6}
+    assert [c_latent["sc_batch"] for c_latent, _ in results] == [{"group": 0, "offset": offset, "batch_size": 6} for offset in (0, 2, 5)]
+    assert len({c_latent["samples"].untyped_storage().data_ptr() for c_latent, _ in results}) == 1
+    assert [b_latent["samples"].shape[0] for _, b_latent in results] == [2, 3, 1]
+
+def test_different_shapes_and_inits_are_not_mixed():
+    coalescer = coalesce.LatentCoalescer(window=0.05)
+    results = serve(coalescer,
+                    (("SC_EmptyLatentImageACF_plus", 1024, 1024, 1), {}),
+                    (("SC_EmptyLatentImageACF_plus", 1536, 1024, 1), {}),
+                    (("SC_EmptyLatentImageACF_plus", 1024, 1024, 1), {"init": "noise"}))
+    assert coalescer.stats["groups"] == 3
+    assert len({c_latent["sc_batch"]["group"] for c_latent, _ in results}) == 3
+
+def test_full_groups_are_flushed_early():
+    coalescer = coalesce.LatentCoalescer(window=0.05, max_batch=4)
+    results = serve(coalescer, *[(("SC_EmptyLatentImageACF_plus", 1024, 1024, 3), {}) for _ in range(3)])
+    assert coalescer.stats == {"requests": 3, "groups": 3, "samples": 9}
+    assert [c_latent["sc_batch"]["offset"] for c_latent, _ in results] == [0, 0, 0]
+    with pytest.raises(ValueError, match="max_batch"):
+        serve(coalescer, (("SC_EmptyLatentImageACF_plus", 1024, 1024, 5), {}))
+
+@pytest.mark.parametrize("init", ["zeros", "noise"])
+def test_each_request_gets_its_own_latents(init):
+    coalescer = coalesce.LatentCoalescer(window=0.05)
+    requests = [("SC_EmptyLatentImageACF_plus", 1024, 1024, 2, init, 7), ("SC_EmptyLatentImageAutoResonance", 1024, 1024, 3, init, 8), ("SC_EmptyLatentImageACF_plus", 1024, 1024, 1, init, 7)]
+    results = serve(coalescer, *[((node_type, width, height, batch_size), {"init": init, "seed": seed}) for node_type, width, height, batch_size, init, seed in requests])
+    for request, (c_latent, b_latent) in zip(requests, results):
+        c_expected, b_expected = alone(*request)
+        assert torch.equal(c_latent["samples"], c_expected) and torch.equal(b_latent["samples"], b_expected)
+        assert c_latent["sc_cost"]["batch_size"] == b_latent["sc_cost"]["batch_size"] == request[3]
+
+def test_group_noise_is_one_allocation():
+    plan = stable_cascade_planner.plan_dimensions("SC_EmptyLatentImageACF_plus", 1024, 1024)
+    c_samples, b_samples = coalesce.allocate_group(plan, "noise", [(2, 5), (1, 6)])
+    assert c_samples.is_contiguous() and c_samples.shape == (3, 16, plan["c_height"], plan["c_width"])
+    assert torch.equal(b_samples[2:], stable_cascade_latents.seeded_noise(6, "stage_b", [1, 4, plan["b_height"], plan["b_width"]]))
+
+def test_simulation_finds_no_mismatches():
+    stats = asyncio.run(coalesce.simulate(requests=40, init="noise", sizes=[(1024, 1024), (1536, 1024)]))
+    assert stats["mismatches"] == 0 and stats["requests"] == 40
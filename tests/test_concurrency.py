@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
+
+import pytest
+import torch
+
+import stable_cascade_ACF_plus
+import stable_cascade_ACF_plus_min
+import stable_cascade_AutoResonanceACFWithVAE
+import stable_cascade_planner
+from stub_vae import StubVAE
+
+
+SIZES = [(1024, 1024), (1536, 640), (512, 2048), (4096, 1024), (800, 1216), (2048, 2048), (640, 1536), (1152, 896)]
+
+def requests(with_image):
+    yield from (dict(width=width, height=height, batch_size=2) for width, height in SIZES)
+    yield from (dict(width=width, height=height, batch_size=3, init="noise", seed=index) for index, (width, height) in enumerate(SIZES))
+    if with_image:
+        vae = StubVAE()
+        for index, (width, height) in enumerate(SIZES):
+            image = torch.rand(2, height // 8, width // 8, 3, generator=torch.Generator().manual_seed(index))
+            yield dict(width=1024, height=1024, batch_size=2, image=image, vae=vae)
+            yield dict(width=1024, height=1024, batch_size=2, image=image, vae=vae, fit_mode="letterbox", target_mean=True)
+
+def samples(output):
+    return [[latent["samples"] for latent in latents] for latents in output]
+
+@pytest.mark.parametrize("node_class, with_image, extra", [
+    (stable_cascade_ACF_plus_min.SC_EmptyLatentImageACF_plus_min, False, {}),
+    (stable_cascade_ACF_plus.SC_EmptyLatentImageACF_plus, False, {}),
+    (stable_cascade_AutoResonanceACFWithVAE.AutoResonanceAdvancedACF, True, {"offset": 1}),
+])
+def test_shared_instance_matches_serial_reference(node_class, with_image, extra):
+    node = node_class()
+    generate = getattr(node, node_class.FUNCTION)
+    work = [dict(extra, **request) for request in requests(with_image)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        reference = [samples(generate(**request)) for request in work]
+
+        # Cold caches, so the threads also race on the planning itself
+        stable_cascade_planner._plan_cache.clear()
+        order = [index for _ in range(4) for index in range(len(work))]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda index: (index, samples(generate(**work[index]))), order))
+
+    for index, result in results:
+        expected = reference[index]
+        assert len(result) == len(expected)
+        for latents, expected_latents in zip(result, expected):
+            assert len(latents) == len(expected_latents)
+            assert all(torch.equal(latent, expected_latent) for latent, expected_latent in zip(latents, expected_latents)), work[index]
@@ -0,0 +1,62 @@
+import json
+import os
+
+import torch
+
+import stable_cascade_vae
+from stub_vae import StubVAE
+
+
+class WeightedVAE(StubVAE):
+    """StubVAE with a first stage model, counting its encodes."""
+
+    def __init__(self, seed=0):
+        self.first_stage_model = torch.nn.Conv2d(3, 16, 1)
+        torch.nn.init.normal_(self.first_stage_model.weight, generator=torch.Generator().manual_seed(seed))
+        torch.nn.init.zeros_(self.first_stage_model.bias)
+        self.encodes = 0
+
+    def encode(self, pixels):
+        self.encodes += 1
+        return super().encode(pixels)
+
+
+def test_entry_is_the_interior_of_an_encoded_patch(tmp_path):
+    vae = WeightedVAE()
+    latent = stable_cascade_vae.ConstantLatentTable(str(tmp_path)).get(vae, (0.2, 0.4, 0.6))
+    expected = StubVAE().encode(torch.tensor([0.2, 0.4, 0.6]).expand(1, 128, 128, 3))[:, :, 1:-1, 1:-1].mean((0, 2, 3))
+    assert latent.shape == (1, 16, 1, 1)
+    assert torch.allclose(latent.flatten(), expected)
+
+def test_entries_are_encoded_once_and_reloaded(tmp_path):
+    vae = WeightedVAE()
+    table = stable_cascade_vae.ConstantLatentTable(str(tmp_path))
+    first = table.get(vae, (0.5, 0.5, 0.5))
+    assert torch.equal(table.get(vae, (0.5, 0.5, 0.5)), first)
+    assert vae.encodes == 1
+
+    path = table.path(table.fingerprint(vae))
+    with open(path) as f:
+        assert list(json.load(f)) == ["0.5000,0.5000,0.5000"]
+    # A new table, as after a restart, reads the file instead of encoding
+    reloaded_vae = WeightedVAE()
+    assert torch.equal(stable_cascade_vae.ConstantLatentTable(str(tmp_path)).get(reloaded_vae, (0.5, 0.5, 0.5)), first)
+    assert reloaded_vae.encodes == 0
+
+def test_empty_directory_keeps_the_table_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    table = stable_cascade_vae.ConstantLatentTable("")
+    table.get(WeightedVAE(), (0.1, 0.1, 0.1))
+    assert os.listdir(tmp_path) == []
+
+def test_fingerprint_follows_the_weights():
+    fingerprint = stable_cascade_vae.vae_fingerprint
+    assert fingerprint(WeightedVAE(0)) == fingerprint(WeightedVAE(0))
+    assert fingerprint(WeightedVAE(0)) != fingerprint(WeightedVAE(1))
+    assert fingerprint(WeightedVAE(0)) != fingerprint(StubVAE())
+
+def test_solid_latent_fills_every_pixel():
+    vae = WeightedVAE()
+    solid = stable_cascade_vae.solid_latent(vae, (0.3, 0.3, 0.3), 2, 12, 8)
+    assert solid.shape == (2, 16, 8, 12)
+    assert torch.equal(solid, stable_cascade_vae.constant_latent(vae, (0.3, 0.3, 0.3)).expand(2, -1, 8, 12))
@@ -0,0 +1,39 @@
+import pytest
+
+import stable_cascade_costs
+import stable_cascade_LatentPlanner
+import stable_cascade_planner
+
+
+def generate(**options):
+    planner = stable_cascade_LatentPlanner.SC_LatentPlanner()
+    c_latents, b_latents, _, _ = planner.generate("acf_plus", 1536, 1024, 10, **options)
+    plan = stable_cascade_planner.plan_strategy("acf_plus", 1536, 1024)
+    return plan, c_latents, b_latents
+
+@pytest.mark.parametrize("chunk_size", [0, 4])
+def test_each_latent_carries_only_its_own_stage(chunk_size):
+    plan, c_latents, b_latents = generate(chunk_size=chunk_size)
+    for stage, latents in (("stage_c", c_latents), ("stage_b", b_latents)):
+        for latent in latents:
+            cost = latent["sc_cost"]
+            expected = stable_cascade_planner.estimate_cost(plan, latent["samples"].shape[0])
+            assert cost["stage"] == stage and cost["batch_size"] == latent["samples"].shape[0]
+            assert (cost["tokens"], cost["gflops"]) == (expected[stage + "_tokens"], expected[stage + "_gflops"])
+            assert not any(key.startswith("stage_") for key in cost)
+
+def test_records_add_up_to_the_whole_batch():
+    plan, c_latents, b_latents = generate(chunk_size=3)
+    total = stable_cascade_planner.estimate_cost(plan, 10)
+    records = [latent["sc_cost"] for latent in c_latents + b_latents]
+    assert sum(record["gflops"] for record in records) == pytest.approx(total["stage_c_gflops"] + total["stage_b_gflops"])
+    assert sum(record["tokens"] for record in records) == total["stage_c_tokens"] + total["stage_b_tokens"]
+    assert sum(record["latent_bytes"] for record in records) == total["latent_bytes"]
+
+def test_seconds_need_a_calibration(monkeypatch):
+    monkeypatch.setattr(stable_cascade_costs.CALIBRATION, "flops_per_second", lambda: None)
+    plan, c_latents, _ = generate()
+    assert c_latents[0]["sc_cost"]["seconds"] is None
+    monkeypatch.setattr(stable_cascade_costs.CALIBRATION, "flops_per_second", lambda: 1e12)
+    cost = stable_cascade_costs.stage_cost(plan, c_latents[0]["samples"], "stage_c")
+    assert cost["seconds"] == pytest.approx(cost["gflops"] * 1e9 / 1e12)
@@ -0,0 +1,76 @@
+import csv
+import io
+import math
+import sys
+
+import pytest
+
+import stable_cascade_explorer as explorer
+import stable_cascade_planner as planner
+
+
+def run(monkeypatch, capsys, *args):
+    monkeypatch.setattr(sys, "argv", ["stable_cascade_explorer.py"] + list(args))
+    explorer.main()
+    return capsys.readouterr().out
+
+def test_ranges_include_the_stop_value():
+    assert explorer.parse_range("1024") == [1024]
+    assert explorer.parse_range("512:640") == [512, 544, 576, 608, 640]
+    assert explorer.parse_range("512:700:64") == [512, 576, 640]
+
+def test_options_are_typed():
+    assert explorer.parse_option("offset=2") == ("offset", 2)
+    assert explorer.parse_option("weight=0.5") == ("weight", 0.5)
+    assert explorer.parse_option("target_mean=True") == ("target_mean", True)
+    assert explorer.parse_option("method=min") == ("method", "min")
+
+def test_node_patterns_may_leave_out_the_prefix():
+    assert explorer.select_nodes(["ACF_plus"]) == ["SC_EmptyLatentImageACF_plus"]
+    assert set(explorer.select_nodes(["*"])) == set(planner.NODE_PLANS)
+    with pytest.raises(ValueError):
+        explorer.select_nodes(["NoSuchNode*"])
+
+def test_csv_rows_match_the_planner(monkeypatch, capsys):
+    out = run(monkeypatch, capsys, "--node", "ACF_plus", "--width", "1024:1088", "--height", "512:576", "--format", "csv", "-j", "1")
+    header, *rows = list(csv.reader(io.StringIO(out)))
+    assert header == explorer.COLUMNS
+    assert [(int(row[1]), int(row[2])) for row in rows] == [(1024, 512), (1024, 544), (1024, 576), (1056, 512), (1056, 544), (1056, 576), (1088, 512), (1088, 544), (1088, 576)]
+    for row in rows:
+        plan = planner.plan_dimensions(row[0], int(row[1]), int(row[2]))
+        assert [int(value) for value in row[5:]] == [plan[column] for column in explorer.COLUMNS[5:]]
+        assert float(row[4]) == plan["gap"]
+
+def test_table_is_aligned_and_blanks_missing_values(monkeypatch, capsys):
+    lines = run(monkeypatch, capsys, "--node", "AutoResonanceBasic", "--width", "1024", "--height", "1024", "-j", "1").splitlines()
+    assert lines[0].split() == explorer.COLUMNS
+    assert len({len(line) for line in lines}) == 1
+    # No compression factor or gap for the non-ACF nodes, so those columns are blank
+    assert lines[1].split() == ["SC_EmptyLatentImageAutoResonanceBasic", "1024", "1024", "32", "32", "256", "256"]
+
+def test_unmatched_sizes_report_an_infinite_gap(monkeypatch, capsys):
+    out = run(monkeypatch, capsys, "--node", "ACF_plus", "--width", "544", "--height", "512", "--format", "csv", "-j", "1")
+    row = list(csv.reader(io.StringIO(out)))[1]
+    assert row[3:5] == ["32", "inf"]
+
+def test_parallel_and_serial_runs_agree():
+    nodes = explorer.select_nodes(["ACF_*"])
+    widths, heights = explorer.parse_range("512:1024:128"), explorer.parse_range("768:2048:256")
+    assert explorer.explore(nodes, widths, heights, jobs=2) == explorer.explore(nodes, widths, heights, jobs=1)
+
+def test_parquet_needs_an_output_file(monkeypatch, capsys):
+    with pytest.raises(SystemExit):
+        run(monkeypatch, capsys, "--node", "ACF_plus", "--width", "1024", "--height", "1024", "--format", "parquet")
+
+def test_parquet_without_pyarrow_exits_with_a_hint(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(SystemExit, match="pyarrow"):
+        explorer.write_parquet([], str(tmp_path / "plans.parquet"))
+
+def test_parquet_keeps_infinite_gaps(tmp_path):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    rows = explorer.explore(explorer.select_nodes(["ACF_plus", "AutoResonanceBasic"]), [544, 1024], [512], jobs=1)
+    explorer.write_parquet(rows, str(tmp_path / "plans.parquet"))
+    gaps = pyarrow_parquet.read_table(str(tmp_path / "plans.parquet")).column("gap").to_pylist()
+    assert math.isinf(gaps[0]) and gaps[1] == planner.plan_dimensions("SC_EmptyLatentImageACF_plus", 1024, 512)["gap"]
+    assert gaps[2:] == [None, None]
@@ -0,0 +1,62 @@
+import pytest
+import torch
+
+import comfy.utils
+import stable_cascade_LatentPlanner
+import stable_cascade_planner
+import stable_cascade_vae
+from stub_vae import StubVAE
+
+
+def image(width=160, height=96, batch=2):
+    return torch.rand(batch, height, width, 3, generator=torch.Generator().manual_seed(width + height))
+
+def shares_storage(view, samples):
+    return view.untyped_storage().data_ptr() == samples.untyped_storage().data_ptr()
+
+@pytest.mark.parametrize("size", [(64, 64), (128, 32), (32, 128), (160, 96)])
+def test_center_crop_is_a_view_like_common_upscale(size):
+    samples = image().movedim(-1, 1)
+    cropped = stable_cascade_vae.center_crop(samples, *size)
+    assert shares_storage(cropped, samples)
+    assert torch.equal(comfy.utils.common_upscale(cropped, *size, "bicubic", "disabled"), comfy.utils.common_upscale(samples, *size, "bicubic", "center"))
+
+@pytest.mark.parametrize("axis", [-1, -2])
+def test_smart_crop_keeps_the_detailed_window(axis):
+    # A flat 160x96 (or 96x160) frame with detail in 100-140 along its long axis
+    shape = [1, 3, 96, 160] if axis == -1 else [1, 3, 160, 96]
+    samples = torch.full(shape, 0.5)
+    detail = samples.narrow(axis, 100, 40)
+    detail.copy_(torch.rand(detail.shape, generator=torch.Generator().manual_seed(0)))
+
+    cropped = stable_cascade_vae.smart_crop(samples, 64, 64)
+    assert cropped.shape[-2:] == (96, 96)
+    assert shares_storage(cropped, samples)
+    start = next(start for start in range(65) if torch.equal(cropped, samples.narrow(axis, start, 96)))
+    assert start <= 100 and start + 96 >= 140
+
+def test_smart_crop_keeps_a_matching_aspect():
+    samples = image().movedim(-1, 1)
+    assert stable_cascade_vae.smart_crop(samples, 320, 192) is samples
+
+def test_letterbox_fills_the_border_with_grey():
+    output = stable_cascade_vae.resize(image(160, 96), 128, 128, fit="letterbox", grey_value=0.25)
+    # 160x96 scaled by 0.8 is 128x77, centered 25 rows down
+    assert output.shape == (2, 128, 128, 3)
+    assert torch.all(output[:, :25] == 0.25) and torch.all(output[:, 25 + 77:] == 0.25)
+    inner = stable_cascade_vae.resample(image(160, 96).movedim(-1, 1), 128, 77).movedim(1, -1)
+    assert torch.equal(output[:, 25:25 + 77], inner)
+
+def test_stretch_resamples_the_whole_image():
+    output = stable_cascade_vae.resize(image(160, 96), 64, 64, fit="stretch")
+    assert torch.equal(output, stable_cascade_vae.resample(image(160, 96).movedim(-1, 1), 64, 64).movedim(1, -1))
+
+@pytest.mark.parametrize("fit_mode", stable_cascade_vae.FIT_MODES)
+def test_planned_latent_follows_the_fit_mode(fit_mode):
+    # match_image plans from the 2048x512 image, every other mode from width x height
+    planner = stable_cascade_LatentPlanner.SC_LatentPlanner()
+    picture = torch.rand(1, 512, 2048, 3)
+    c_latents, b_latents, _, _ = planner.generate("autoresonance_acf_vae", 1024, 1024, image=picture, vae=StubVAE(), fit_mode=fit_mode)
+    plan = stable_cascade_planner.plan_strategy("autoresonance_acf_vae", 1024, 1024, (2048, 512) if fit_mode == "match_image" else None)
+    assert c_latents[0]["samples"].shape == (1, 16, plan["c_height"], plan["c_width"])
+    assert b_latents[0]["samples"].shape == (1, 4, plan["b_height"], plan["b_width"])
@@ -0,0 +1,115 @@
+import json
+import os
+import pstats
+
+import pytest
+import torch
+
+import stable_cascade_ACF_plus
+import stable_cascade_instrumentation as instrumentation
+
+
+@pytest.fixture
+def registry():
+    registry = instrumentation.MetricsRegistry()
+    registry.enable()
+    return registry
+
+def test_disabled_registry_hands_out_the_null_timer():
+    registry = instrumentation.MetricsRegistry()
+    registry.disable()
+    timer = registry.start("Node")
+    assert timer is instrumentation.NULL_TIMER
+    timer.mark("planning")
+    timer.finish(torch.zeros(4))
+    assert registry.snapshot() == {}
+
+def test_phases_and_memory_are_aggregated(registry):
+    for size in (4, 16):
+        timer = registry.start("Node")
+        timer.mark("planning")
+        timer.mark("allocation")
+        timer.finish(torch.zeros(size), torch.zeros(size, dtype=torch.float16))
+
+    node = registry.snapshot()["Node"]
+    assert set(node["phases"]) == {"planning", "allocation", "total"}
+    for entry in node["phases"].values():
+        assert entry["count"] == 2
+        assert 0 <= entry["max_seconds"] <= entry["total_seconds"]
+    assert node["memory"] == {"output_bytes": 16 * 4 + 16 * 2, "device_peak_bytes": 0}
+
+    registry.reset()
+    assert registry.snapshot() == {}
+
+def test_json_and_prometheus_output(registry):
+    timer = registry.start("Node")
+    timer.mark("planning")
+    timer.finish(torch.zeros(8))
+
+    assert json.loads(registry.to_json()) == registry.snapshot()
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE sc_phase_calls_total counter" in lines
+    assert 'sc_phase_calls_total{node="Node",phase="planning"} 1' in lines
+    assert 'sc_phase_calls_total{node="Node",phase="total"} 1' in lines
+    assert 'sc_output_bytes_max{node="Node"} 32' in lines
+    assert 'sc_device_peak_bytes_max{node="Node"} 0' in lines
+    samples = [line for line in lines if not line.startswith("#")]
+    assert all(len(line.rsplit(" ", 1)) == 2 and float(line.rsplit(" ", 1)[1]) >= 0 for line in samples)
+
+def test_nodes_record_into_the_shared_registry(monkeypatch, registry):
+    monkeypatch.setattr(instrumentation, "start", registry.start)
+    stable_cascade_ACF_plus.SC_EmptyLatentImageACF_plus().generate(1024, 1024, 2)
+    node = registry.snapshot()["SC_EmptyLatentImageACF_plus"]
+    assert {"planning", "allocation", "total"} <= set(node["phases"])
+    assert node["memory"]["output_bytes"] > 0
+
+
+def profiler(tmp_path, mode="cprofile", sample_rate=1.0):
+    profiler = instrumentation.ExecutionProfiler()
+    profiler.configure(mode, str(tmp_path), sample_rate)
+    return profiler
+
+def work(value):
+    return torch.arange(value).sum().item()
+
+def test_cprofile_writes_one_stats_file_per_execution(tmp_path):
+    runner = profiler(tmp_path)
+    assert runner.run("Node", work, 10) == 45
+    assert runner.run("Node", work, 5) == 10
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2 and all(name.startswith("Node_noprompt_") and name.endswith(".prof") for name in files)
+    pstats.Stats(str(tmp_path / files[0]))
+
+def test_torch_profiler_writes_a_chrome_trace(tmp_path):
+    profiler(tmp_path, "torch").run("Node", work, 10)
+    name, = os.listdir(tmp_path)
+    with open(tmp_path / name) as f:
+        assert "traceEvents" in json.load(f)
+
+@pytest.mark.parametrize("draw, profiled", [(0.2, True), (0.6, False)])
+def test_sample_rate_selects_executions(monkeypatch, tmp_path, draw, profiled):
+    monkeypatch.setattr(instrumentation.random, "random", lambda: draw)
+    profiler(tmp_path, sample_rate=0.5).run("Node", work, 10)
+    assert len(os.listdir(tmp_path)) == (1 if profiled else 0)
+
+def test_off_and_concurrent_executions_run_unprofiled(tmp_path):
+    runner = profiler(tmp_path)
+    with runner.lock:
+        assert runner.run("Node", work, 10) == 45
+    runner.configure(mode="")
+    assert runner.mode is None
+    assert runner.run("Node", work, 10) == 45
+    assert not tmp_path.exists() or os.listdir(tmp_path) == []
+
+def test_configure_only_changes_what_it_is_given(tmp_path):
+    runner = profiler(tmp_path, sample_rate=0.25)
+    runner.configure(directory=str(tmp_path / "other"))
+    assert (runner.mode, runner.directory, runner.sample_rate) == ("cprofile", str(tmp_path / "other"), 0.25)
+    runner.configure(sample_rate=1.0)
+    assert runner.mode == "cprofile"
+
+def test_profiled_nodes_go_through_the_profiler(monkeypatch, tmp_path):
+    monkeypatch.setattr(instrumentation, "PROFILER", profiler(tmp_path))
+    stable_cascade_ACF_plus.SC_EmptyLatentImageACF_plus().generate(1024, 1024, 1)
+    name, = os.listdir(tmp_path)
+    assert name.startswith("SC_EmptyLatentImageACF_plus_")
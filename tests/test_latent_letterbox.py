@@ -0,0 +1,46 @@
+import torch
+
+import stable_cascade_LatentPlanner
+import stable_cascade_vae
+from stub_vae import StubVAE
+
+
+class CountingVAE(StubVAE):
+    def __init__(self):
+        self.encoded_pixels = 0
+
+    def encode(self, pixels):
+        self.encoded_pixels += pixels.shape[0] * pixels.shape[1] * pixels.shape[2]
+        return super().encode(pixels)
+
+
+def image(width=256, height=128, batch=2):
+    return torch.rand(batch, height, width, 3, generator=torch.Generator().manual_seed(width * height))
+
+def test_latent_letterbox_matches_encoding_the_pixel_letterbox():
+    # The 2:1 image fills rows 4-12 of a 16x16 latent, on latent pixel boundaries, so the
+    # pooling stub VAE encodes the pixel letterbox to exactly the same latent
+    vae = StubVAE()
+    latent = stable_cascade_vae.encode_letterboxed(vae, image(), 16, 16, grey_value=0.3)
+    pixels = stable_cascade_vae.resize(image(), 512, 512, fit="letterbox", grey_value=0.3)
+    assert latent.shape == (2, 16, 16, 16)
+    assert torch.allclose(latent, vae.encode(pixels), atol=1e-6)
+
+def test_border_is_the_grey_latent():
+    latent = stable_cascade_vae.encode_letterboxed(StubVAE(), image(), 16, 16, grey_value=0.3)
+    grey = stable_cascade_vae.constant_latent(StubVAE(), (0.3, 0.3, 0.3))
+    assert torch.allclose(latent[:, :, :4], grey.expand(2, -1, 4, 16), atol=1e-6)
+    assert torch.allclose(latent[:, :, 12:], grey.expand(2, -1, 4, 16), atol=1e-6)
+
+def test_only_the_image_is_encoded():
+    vae = CountingVAE()
+    stable_cascade_vae.constant_latent(vae, (0.5, 0.5, 0.5))
+    vae.encoded_pixels = 0
+    stable_cascade_vae.encode_letterboxed(vae, image(), 16, 16)
+    assert vae.encoded_pixels == 2 * 512 * 256
+
+def test_node_outputs_the_planned_latent():
+    planner = stable_cascade_LatentPlanner.SC_LatentPlanner()
+    c_latents, _, _, _ = planner.generate("autoresonance_acf_vae", 1024, 1024, 2, image=image(), vae=StubVAE(), fit_mode="latent_letterbox")
+    letterbox, _, _, _ = planner.generate("autoresonance_acf_vae", 1024, 1024, 2, image=image(), vae=StubVAE(), fit_mode="letterbox")
+    assert c_latents[0]["samples"].shape == letterbox[0]["samples"].shape
@@ -0,0 +1,66 @@
+import torch
+import pytest
+
+import stable_cascade_ACF_plus
+import stable_cascade_LatentPlanner
+import stable_cascade_planner
+from stub_vae import StubVAE
+
+
+def sizes(latents):
+    return [latent["samples"].shape[0] for latent in latents]
+
+@pytest.mark.parametrize("images, batch_size, expected_c, expected_b", [(5, 5, [2, 2, 1], [2, 2, 1]), (6, 5, [2, 2, 2], [2, 2, 1])])
+def test_encoded_stage_c_is_split_like_stage_b(images, batch_size, expected_c, expected_b):
+    planner = stable_cascade_LatentPlanner.SC_LatentPlanner()
+    c_latents, b_latents, _, _ = planner.generate("autoresonance_acf_vae", 1024, 1024, batch_size, image=torch.rand(images, 256, 256, 3), vae=StubVAE(),
+                                                  memory_limit="max_memory_mb", max_memory_mb=3, chunk_size=4)
+    assert sizes(c_latents) == expected_c
+    assert sizes(b_latents) == expected_b
+
+@pytest.mark.parametrize("image_size, options", [
+    (None, {}),
+    (None, {"offset": 3, "pad_shortest_to_32": True}),
+    ((2048, 512), {}),
+    ((2048, 512), {"offset": -2, "target_mean": True, "mean": 36}),
+])
+def test_auto_plans_like_the_strategy_it_picks(image_size, options):
+    planner = stable_cascade_LatentPlanner.SC_LatentPlanner()
+    strategy, plan, score = planner.plan("auto", 1024, 1024, image_size, **options)
+    assert (strategy, plan, score) == planner.plan(strategy, 1024, 1024, image_size, **options)
+
+def test_auto_plans_image_strategies_for_the_configured_size():
+    (_, _, plan), = stable_cascade_planner.score_plans(1024, 1024, strategies=["autoresonance_acf_vae"], image_size=(2048, 512))
+    assert plan == stable_cascade_planner.plan_strategy("autoresonance_acf_vae", 1024, 1024, (2048, 512))
+    # Stage B comes from the configured size, not from the image as it would for 2048x512
+    assert (plan["b_width"], plan["b_height"]) == (416, 104)
+
+@pytest.mark.parametrize("width, height", [(4096, 512), (512, 4096), (4096, 1024), (1024, 1024)])
+@pytest.mark.parametrize("offset", [-16, -10, 0, 16])
+@pytest.mark.parametrize("pad_shortest_to_32", [False, True])
+def test_auto_skips_failing_and_degenerate_candidates(width, height, offset, pad_shortest_to_32):
+    # Some strategies divide by zero or shrink Stage C to a sliver at these inputs
+    planner = stable_cascade_LatentPlanner.SC_LatentPlanner()
+    strategy, plan, score = planner.plan("auto", width, height, offset=offset, pad_shortest_to_32=pad_shortest_to_32)
+    assert min(plan["c_width"], plan["c_height"]) >= stable_cascade_planner.MIN_STAGE_C_SIDE
+    for _, _, candidate in stable_cascade_planner.score_plans(width, height, offset=offset, pad_shortest_to_32=pad_shortest_to_32):
+        assert min(candidate["c_width"], candidate["c_height"]) >= stable_cascade_planner.MIN_STAGE_C_SIDE
+
+def test_auto_rejects_unknown_strategies():
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        stable_cascade_planner.score_plans(1024, 1024, strategies=["acf_plus", "nope"])
+
+
+def test_legacy_nodes_return_latent_lists():
+    c_latents, b_latents = stable_cascade_ACF_plus.SC_EmptyLatentImageACF_plus().generate(1024, 1024, 2)
+    assert sizes(c_latents) == sizes(b_latents) == [2]
+    assert c_latents[0]["samples"].shape == (2, 16, 32, 32)
+
+def test_zero_chunks_share_one_allocation():
+    c_latents, b_latents = stable_cascade_ACF_plus.SC_EmptyLatentImageACF_plus().generate(1024, 1024, 5, chunk_size=2)
+    assert sizes(c_latents) == [2, 2, 1]
+    assert len({latent["samples"].data_ptr() for latent in c_latents}) == 1
+    # Cloned chunks are the documented way to write in place
+    chunk = c_latents[0]["samples"].clone()
+    chunk += 1
+    assert not c_latents[1]["samples"].any()
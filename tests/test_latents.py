@@ -0,0 +1,79 @@
+import pytest
+import torch
+
+import stable_cascade_latents as latents
+import stable_cascade_planner as planner
+
+
+def test_sample_is_independent_of_batch():
+    batch = latents.seeded_noise(1234, "stage_c", [12, 16, 24, 24])
+    single = latents.seeded_noise(1234, "stage_c", [1, 16, 24, 24], start_index=7)
+    assert torch.equal(batch[7], single[0])
+
+def test_blocks_do_not_change_noise():
+    shape = [6, 4, 17, 33]
+    reference = latents.seeded_noise(9, "stage_b", shape)
+    assert torch.equal(latents.seeded_noise(9, "stage_b", shape, block_elements=1), reference)
+    assert torch.equal(latents.seeded_noise(9, "stage_b", shape, block_elements=5000), reference)
+
+def test_noise_writes_into_out():
+    out = torch.full([3, 16, 8, 8], float("nan"))
+    result = latents.seeded_noise(3, "stage_c", list(out.shape), out=out)
+    assert result is out
+    assert torch.equal(out, latents.seeded_noise(3, "stage_c", list(out.shape)))
+
+def test_noise_is_standard_normal_and_independent():
+    noise = latents.seeded_noise(5, "stage_c", [64, 16, 24, 24]).flatten()
+    assert abs(noise.mean().item()) < 0.01
+    assert abs(noise.std().item() - 1) < 0.01
+    other_stream = latents.seeded_noise(5, "stage_b", [64, 16, 24, 24]).flatten()
+    other_seed = latents.seeded_noise(6, "stage_c", [64, 16, 24, 24]).flatten()
+    assert abs((noise * other_stream).mean().item()) < 0.01
+    assert abs((noise * other_seed).mean().item()) < 0.01
+
+@pytest.mark.parametrize("batch_sizes", [[7], [3, 3, 1], [1] * 7])
+def test_chunked_noise_matches_whole_batch(batch_sizes):
+    whole, _ = latents.initial_latents([7], 16, 20, 30, "stage_c", "noise", 42, start_index=5)
+    samples, chunks = latents.initial_latents(batch_sizes, 16, 20, 30, "stage_c", "noise", 42, start_index=5)
+    assert [chunk["samples"].shape[0] for chunk in chunks] == batch_sizes
+    assert torch.equal(torch.cat([chunk["samples"] for chunk in chunks]), whole)
+    assert torch.equal(samples, whole)
+
+def test_zeros_share_one_allocation():
+    samples, chunks = latents.initial_latents([4, 4, 2], 4, 16, 16, "stage_b")
+    assert samples.shape[0] == 4
+    assert all(chunk["samples"].data_ptr() == samples.data_ptr() for chunk in chunks)
+    assert not any(chunk["samples"].any() for chunk in chunks)
+
+
+PLAN = {"c_width": 32, "c_height": 32, "b_width": 256, "b_height": 256}
+MB = 1024 * 1024
+
+def test_batches_are_unlimited_by_default():
+    assert latents.limit_batch_size(PLAN, 4096) == 4096
+    assert latents.plan_batches(PLAN, 10, chunk_size=4) == [4, 4, 2]
+    assert latents.plan_batches(PLAN, 3, chunk_size=8) == [3]
+
+def test_batch_size_is_clamped_to_the_budget(capsys):
+    fits = planner.max_batch_size(PLAN, 8 * MB)
+    assert 1 < fits < 16
+    assert latents.limit_batch_size(PLAN, 16, "max_memory_mb", 8) == fits
+    assert "clamped to" in capsys.readouterr().out
+    assert latents.limit_batch_size(PLAN, fits, "max_memory_mb", 8) == fits
+    assert planner.latent_bytes(PLAN, fits) <= 8 * MB < planner.latent_bytes(PLAN, fits + 1)
+
+def test_auto_budget_is_the_free_device_memory(monkeypatch):
+    monkeypatch.setattr(latents.comfy.model_management, "get_free_memory", lambda device=None: 3 * planner.latent_bytes(PLAN))
+    assert latents.limit_batch_size(PLAN, 8, "auto") == 3
+
+def test_chunks_are_clamped_and_cover_the_batch():
+    fits = planner.max_batch_size(PLAN, 8 * MB)
+    assert latents.plan_batches(PLAN, 20, 0, "max_memory_mb", 8) == [fits]
+    sizes = latents.plan_batches(PLAN, 20, 16, "max_memory_mb", 8)
+    assert sum(sizes) == 20 and max(sizes) == fits
+    assert latents.plan_batches(PLAN, 20, 2, "max_memory_mb", 8) == [2] * 10
+
+@pytest.mark.parametrize("chunk_size", [0, 4])
+def test_not_even_one_latent_fits(chunk_size):
+    with pytest.raises(ValueError, match="more than the 1.0 MB available"):
+        latents.plan_batches(PLAN, 4, chunk_size, "max_memory_mb", 1)
@@ -0,0 +1,64 @@
+import pytest
+import torch
+
+import addgreyletterbox
+import stable_cascade_paths
+import stable_cascade_vae
+
+
+def frames():
+    generator = torch.Generator().manual_seed(0)
+    return [torch.rand(2, 48, 80, 3, generator=generator), torch.rand(1, 96, 32, 3, generator=generator)]
+
+def letterbox(precision="auto"):
+    (output,) = addgreyletterbox.AddGreyLetterbox().add_letterbox(frames(), 0.5, "", precision)
+    return output
+
+# The tolerances documented at addgreyletterbox.PRECISION_DTYPES
+@pytest.mark.parametrize("precision, tolerance", [("fp16", 2.5e-4), ("bf16", 2.0e-3), ("uint8", 2.0e-3)])
+def test_letterbox_precision_tolerance(precision, tolerance):
+    reference = letterbox()
+    output = letterbox(precision)
+    assert output.dtype == addgreyletterbox.PRECISION_DTYPES[precision]
+    values = output.float() / 255 if precision == "uint8" else output.float()
+    assert (values - reference).abs().max().item() <= tolerance
+
+def test_node_outputs_numpy_convertible_images():
+    node = addgreyletterbox.AddGreyLetterbox()
+    assert "precision" not in node.INPUT_TYPES()["optional"]
+    # As the node is called, with every input wrapped in a list
+    (output,) = node.add_letterbox(frames(), [0.5], [""])
+    assert output.dtype == torch.float32
+    # SaveImage and PreviewImage go through numpy, which has no bf16
+    assert output.numpy().shape == (3, 96, 96, 3)
+
+def test_node_maps_output_under_the_output_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(stable_cascade_paths, "comfy_directory", lambda kind: str(tmp_path))
+    (output,) = addgreyletterbox.AddGreyLetterbox().add_letterbox(frames(), [0.5], ["letterbox.bin"])
+    assert torch.equal(output, letterbox())
+    assert (tmp_path / "letterbox.bin").stat().st_size == output.numel() * 4
+
+@pytest.mark.parametrize("path", ["../outside.bin", "/tmp/outside.bin", "link/outside.bin"])
+def test_node_refuses_paths_outside_the_output_directory(monkeypatch, tmp_path, path):
+    output_directory = tmp_path / "output"
+    output_directory.mkdir()
+    (output_directory / "link").symlink_to(tmp_path)
+    monkeypatch.setattr(stable_cascade_paths, "comfy_directory", lambda kind: str(output_directory))
+    with pytest.raises(ValueError):
+        addgreyletterbox.AddGreyLetterbox().add_letterbox(frames(), [0.5], [path])
+    assert not (tmp_path / "outside.bin").exists()
+
+def test_streamed_chunks_match_the_node():
+    chunks = list(addgreyletterbox.iter_letterbox(frames(), chunk_size=2, dtype=torch.float16))
+    assert torch.equal(torch.cat(chunks), letterbox("fp16"))
+
+# The tolerances documented at stable_cascade_vae.RESIZE_DTYPES, against fp32 bicubic
+@pytest.mark.parametrize("precision, tolerance", [("fp16", 2e-3), ("bf16", 1e-2)])
+@pytest.mark.parametrize("size", [(64, 64), (40, 24), (160, 96)])
+def test_resize_precision_tolerance(precision, tolerance, size):
+    image = torch.rand(2, 80, 128, 3, generator=torch.Generator().manual_seed(1))
+    reference = stable_cascade_vae.resize(image, *size)
+    output = stable_cascade_vae.resize(image, *size, precision=precision)
+    assert output.dtype == stable_cascade_vae.RESIZE_DTYPES[precision]
+    assert output.shape == reference.shape
+    assert (output.float() - reference).abs().max().item() <= tolerance
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+import stable_cascade_planner as planner
+import stable_cascade_preview_api as preview_api
+
+
+def acf_planners():
+    return [planner.ACFPlanner(method=method, **planner.MODEL_SIZES[model_size]) for model_size in planner.MODEL_SIZES for method in ("plus", "min", "alt")] + [
+        planner.ACFPlanner(30, 30, method="min"),
+        planner.ACFPlanner(24, 40, aspect_max=2.5, compression_max=96, method="plus"),
+    ]
+
+@pytest.mark.parametrize("acf", acf_planners(), ids=lambda acf: f"{acf.method}-{acf.center_min}-{acf.center_max}")
+def test_incremental_search_matches_the_full_search(acf):
+    reference = planner.ACFPlanner(acf.center_min, acf.center_max, acf.aspect_min, acf.aspect_max, acf.compression_max, acf.compression_min, acf.method)
+    incremental = planner.IncrementalACFPlanner(acf)
+    rng = random.Random(acf.method + str(acf.center_min))
+    width, height, offset = 1024, 1024, 0
+    for _ in range(3000):
+        # Mostly slider steps, now and then a jump
+        if rng.random() < 0.05:
+            width, height = rng.randrange(256, 4097, 32), rng.randrange(256, 4097, 32)
+        else:
+            width = min(4096, max(256, width + rng.choice((-64, -32, 32, 64))))
+            height = min(4096, max(256, height + rng.choice((-64, -32, 0, 32, 64))))
+        offset = min(16, max(-16, offset + rng.choice((-1, 0, 1))))
+
+        expected = reference.search(min(width, height), max(width, height))
+        assert incremental.update(width, height) == expected, (width, height)
+        with planner.incremental_search():
+            plan = planner.plan_acf(acf, width, height, offset)
+        assert (plan["compression"], plan["gap"]) == expected
+        assert (plan["c_width"], plan["c_height"]) == (width // expected[0] + offset, height // expected[0] + offset)
+
+def test_preview_follows_a_slider_incrementally():
+    acf = planner.model_acf_planner("1024", "plus")
+    for width in range(512, 2049, 32):
+        result = preview_api.preview({"node": "SC_EmptyLatentImageACF_plus", "width": width, "height": 1024})
+        assert (result["compression"], result["c_width"], result["c_height"]) == (acf.search(min(width, 1024), max(width, 1024))[0], width // result["compression"], 1024 // result["compression"])
+    assert planner.incremental_planner(acf).last_compression == acf.solve(2048, 1024)[0]
+
+
+C_SIZES = [(32, 32), (24, 24), (40, 24), (24, 40), (48, 16), (16, 60), (37, 23), (1, 1), (3, 1)]
+
+@pytest.mark.parametrize("c_width, c_height", C_SIZES)
+def test_stage_b_ladder_holds_only_valid_sizes(c_width, c_height):
+    solver = planner.StageBPlanner()
+    ladder = solver.ladder(c_width, c_height)
+    assert ladder and ladder == sorted(ladder)
+    for long_edge, short_edge in ladder:
+        assert not planner.stage_b_problems(max(c_width, c_height), min(c_width, c_height), long_edge, short_edge)
+    assert solver.ladder(c_height, c_width) is ladder
+
+@pytest.mark.parametrize("c_width, c_height", C_SIZES)
+def test_stage_b_solver_picks_the_nearest_valid_size(c_width, c_height):
+    solver = planner.StageBPlanner()
+    ladder = solver.ladder(c_width, c_height)
+    for side in range(32, 8193, 224):
+        b_width, b_height = solver.closest(c_width, c_height, side, side // 2)
+        assert not planner.stage_b_problems(c_width, c_height, b_width, b_height)
+        assert (b_width >= b_height) == (c_width >= c_height) or b_width == b_height
+        best = min(abs(long_edge - side / 4) for long_edge, _ in ladder)
+        assert abs(max(b_width, b_height) - side / 4) == best
+
+@pytest.mark.parametrize("max_pixels", [16 * 256 * 256, 1024 * 1024, 2048 * 1536, 10 ** 8])
+def test_stage_b_solver_stays_within_the_pixel_budget(max_pixels):
+    solver = planner.StageBPlanner()
+    for c_width, c_height in [(32, 32), (40, 24), (16, 48)]:
+        allowed = [size for size in solver.ladder(c_width, c_height) if size[0] * size[1] * 16 <= max_pixels]
+        for side in (1024, 4096, 16384):
+            b_width, b_height = solver.closest(c_width, c_height, side, side, max_pixels)
+            assert b_width * b_height * 16 <= max_pixels
+            assert abs(max(b_width, b_height) - side / 4) == min(abs(long_edge - side / 4) for long_edge, _ in allowed)
+
+def test_stage_b_solver_raises_when_nothing_fits():
+    solver = planner.StageBPlanner()
+    smallest = solver.ladder(32, 32)[0]
+    with pytest.raises(ValueError, match="within"):
+        solver.closest(32, 32, 1024, 1024, smallest[0] * smallest[1] * 16 - 1)
+    with pytest.raises(ValueError):
+        solver.closest(0, 32, 1024, 1024)
+
+def test_solver_plans_carry_no_stage_b_warnings():
+    for node_type in planner.NODE_PLANS:
+        for width, height in [(1024, 1024), (2048, 768), (832, 1216), (4096, 4096)]:
+            plan = planner.plan_dimensions(node_type, width, height, stage_b="solver", max_stage_b_pixels=4096 * 4096)
+            assert not planner.stage_b_problems(plan["c_width"], plan["c_height"], plan["b_width"], plan["b_height"])
+            assert plan["b_width"] * plan["b_height"] * 16 <= 4096 * 4096
+    with pytest.raises(ValueError):
+        planner.plan_dimensions("SC_EmptyLatentImageACF_plus", 1024, 1024, stage_b="nearest")
@@ -0,0 +1,55 @@
+import pytest
+
+import stable_cascade_planner
+import stable_cascade_preview_api as preview_api
+
+
+def test_preview_plans_like_the_node():
+    plan = preview_api.preview({"node": "SC_EmptyLatentImageACF_plus", "width": 1024, "height": 1536, "batch_size": 2})
+    expected = stable_cascade_planner.plan_dimensions("SC_EmptyLatentImageACF_plus", 1024, 1536)
+    assert {key: plan[key] for key in expected} == expected
+    assert plan["cost"]["batch_size"] == 2
+
+@pytest.mark.parametrize("query", [
+    {"node": "SC_EmptyLatentImageACF_plus", "width": 0, "height": 1024},
+    {"node": "SC_EmptyLatentImageACF_plus", "width": 1024, "height": 8192},
+    {"node": "SC_EmptyLatentImageACF_plus", "width": 1000, "height": 1024},
+    {"node": "SC_EmptyLatentImageACF_plus_768", "width": 256, "height": 1024},
+    {"node": "SC_EmptyLatentImageAutoResonanceAdvanced", "width": 1024, "height": 1024, "options": {"offset": 40}},
+    {"node": "AutoResonanceAdvanced", "width": 1024, "height": 1024, "options": {"image_size": [0, 512]}},
+    # Valid inputs whose padding divides by a zero-sized Stage C latent
+    {"node": "AutoResonanceAdvanced", "width": 4096, "height": 512, "options": {"offset": -16, "pad_shortest_to_32": True}},
+    {"node": "Unknown", "width": 1024, "height": 1024},
+    "not a query",
+])
+def test_bad_query_is_an_error_entry(query):
+    assert set(preview_api.preview(query)) == {"error"}
+
+def test_bad_query_does_not_fail_the_batch():
+    results = preview_api.preview_batch({"queries": [
+        {"node": "SC_EmptyLatentImageACF_plus", "width": 0, "height": 0},
+        {"node": "SC_EmptyLatentImageACF_custom", "width": 256, "height": 768},
+    ]})["results"]
+    assert "error" in results[0]
+    assert results[1]["c_width"] > 0
+
+def test_batch_size_is_capped():
+    query = {"node": "SC_EmptyLatentImageACF_plus", "width": 1024, "height": 1024}
+    assert len(preview_api.preview_batch({"queries": [query] * preview_api.MAX_QUERIES})["results"]) == preview_api.MAX_QUERIES
+    with pytest.raises(ValueError):
+        preview_api.preview_batch({"queries": [query] * (preview_api.MAX_QUERIES + 1)})
+    with pytest.raises(ValueError):
+        preview_api.preview_batch({"queries": query})
+
+def test_planner_caches_are_bounded(monkeypatch):
+    monkeypatch.setattr(stable_cascade_planner, "CACHE_LIMIT", 8)
+    monkeypatch.setattr(stable_cascade_planner, "PLANNER_LIMIT", 4)
+    acf = stable_cascade_planner.ACFPlanner(32, 38.5)
+    stage_b = stable_cascade_planner.StageBPlanner()
+    for size in range(512, 4097, 32):
+        acf.solve(size, 1024)
+        stage_b.ladder(size // 32, 32)
+        assert len(acf.index) <= 8 and len(stage_b.ladders) <= 8
+    for center in range(20, 40):
+        stable_cascade_planner.acf_planner(center, 40)
+        assert len(stable_cascade_planner._acf_planners) <= 4
@@ -0,0 +1,35 @@
+import pytest
+import torch
+
+import stable_cascade_vae
+
+
+def image(width=128, height=80, batch=2):
+    return torch.rand(batch, height, width, 3, generator=torch.Generator().manual_seed(width * height))
+
+@pytest.mark.parametrize("method", stable_cascade_vae.RESIZE_METHODS)
+@pytest.mark.parametrize("precision", ["fp32", "fp16", "bf16"])
+@pytest.mark.parametrize("size", [(40, 24), (96, 64), (200, 120)])
+def test_resamplers_in_every_precision(method, precision, size):
+    output = stable_cascade_vae.resize(image(), *size, method, precision)
+    reference = stable_cascade_vae.resize(image(), *size, method)
+    assert output.shape == (2, size[1], size[0], 3)
+    assert output.dtype == stable_cascade_vae.RESIZE_DTYPES.get(precision, torch.float32)
+    assert (output.float() - reference).abs().max().item() <= 1e-2
+
+@pytest.mark.parametrize("method", stable_cascade_vae.RESIZE_METHODS)
+def test_resamplers_keep_a_solid_colour(method):
+    solid = torch.full([1, 80, 128, 3], 0.25)
+    assert torch.allclose(stable_cascade_vae.resize(solid, 40, 24, method), torch.full([1, 24, 40, 3], 0.25), atol=1e-5)
+
+def test_preshrink_pools_by_the_largest_integer_factor():
+    samples = image(130, 70).movedim(-1, 1)
+    shrunk = stable_cascade_vae.preshrink(samples, 40, 20)
+    assert torch.equal(shrunk, torch.nn.functional.avg_pool2d(samples, 3))
+    assert stable_cascade_vae.preshrink(samples, 80, 40) is samples
+
+@pytest.mark.parametrize("method", ["area", "bilinear_aa", "bicubic_aa", "lanczos"])
+def test_integer_downscale_is_the_pooled_image(method):
+    # The pre-shrink lands exactly on the target, so no filter runs after it
+    samples = image().movedim(-1, 1)
+    assert torch.equal(stable_cascade_vae.resample(samples, 32, 20, method), torch.nn.functional.avg_pool2d(samples, 4))
@@ -0,0 +1,50 @@
+import contextlib
+import importlib
+import io
+import multiprocessing
+
+import pytest
+import torch
+
+from stub_vae import StubVAE
+
+
+NOISE = {"init": "noise", "seed": 123456789012, "chunk_size": 2}
+
+# (node module, inputs, shard_count); images are made in the worker from their seed
+CASES = [
+    ("stable_cascade_ACF_plus", {"width": 1024, "height": 1024, "batch_size": 7}, 3),
+    ("stable_cascade_ACF_plus", dict(NOISE, width=1536, height=640, batch_size=11), 3),
+    ("stable_cascade_AutoResonanceAdvanced", dict(NOISE, width=1024, height=1024, offset=0, batch_size=10), 4),
+    ("stable_cascade_AutoResonanceAdvancedWithVAE", dict(NOISE, width=1024, height=768, offset=0, batch_size=5), 5),
+    ("stable_cascade_AutoResonanceACFWithVAE", {"width": 1024, "height": 1024, "offset": 0, "batch_size": 7, "image_seed": 3}, 3),
+    ("stable_cascade_AutoResonanceACFWithVAE", dict(NOISE, width=1024, height=1024, offset=0, batch_size=6, image_seed=4, fit_mode="letterbox"), 4),
+]
+
+def run_node(module, inputs):
+    """Concatenated (stage_c, stage_b) batches of one node run; the multi-process entry point."""
+    inputs = dict(inputs)
+    if "image_seed" in inputs:
+        generator = torch.Generator().manual_seed(inputs.pop("image_seed"))
+        inputs.update(image=torch.rand(inputs["batch_size"], 96, 160, 3, generator=generator), vae=StubVAE())
+    node_class, = importlib.import_module(module).NODE_CLASS_MAPPINGS.values()
+    node = node_class()
+    with contextlib.redirect_stdout(io.StringIO()):
+        c_latents, b_latents = getattr(node, node_class.FUNCTION)(**inputs)
+    return torch.cat([latent["samples"] for latent in c_latents]), torch.cat([latent["samples"] for latent in b_latents])
+
+def test_shards_from_separate_processes_concatenate_to_the_whole_batch():
+    work = [(module, dict(inputs, shard_index=index, shard_count=shard_count)) for module, inputs, shard_count in CASES for index in range(shard_count)]
+    # Fresh interpreters, as separate hosts would be, so nothing is shared but the inputs
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        shards = pool.starmap(run_node, work)
+
+    for module, inputs, shard_count in CASES:
+        parts, shards = shards[:shard_count], shards[shard_count:]
+        c_latent, b_latent = run_node(module, inputs)
+        assert torch.equal(torch.cat([c for c, b in parts]), c_latent), (module, inputs)
+        assert torch.equal(torch.cat([b for c, b in parts]), b_latent), (module, inputs)
+
+def test_more_shards_than_samples_is_an_error():
+    with pytest.raises(ValueError):
+        run_node("stable_cascade_ACF_plus", {"width": 1024, "height": 1024, "batch_size": 2, "shard_index": 0, "shard_count": 3})
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import comfy.model_management
+import pytest
+import torch
+
+import stable_cascade_vae
+from stub_vae import ComfyStubVAE, StubVAE
+
+
+DEVICES = [torch.device("cpu", index) for index in range(4)]
+
+class RecordingVAE(ComfyStubVAE):
+    """ComfyStubVAE recording the batches its first stage model encoded."""
+
+    def __init__(self, device=DEVICES[0]):
+        super().__init__(device)
+        self.used = []
+        encode = self.first_stage_model.encode
+        self.first_stage_model.encode = lambda x: self.used.append(x.shape[0]) or encode(x)
+
+    def __deepcopy__(self, memo):
+        return RecordingVAE(self.device)
+
+class PlainVAE(StubVAE):
+    """A VAE that is not laid out like ComfyUI's but also loads through model management."""
+
+    def __init__(self, device=DEVICES[0]):
+        self.device = device
+
+    def __deepcopy__(self, memo):
+        return PlainVAE(self.device)
+
+    def encode(self, pixels):
+        comfy.model_management.load_models_gpu([])
+        return super().encode(pixels)
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Devices of every load_models_gpu() call, failing when two calls overlap."""
+    calls = []
+    active = []
+    def load_models_gpu(patchers, **options):
+        active.append(None)
+        overlapping = len(active) > 1
+        time.sleep(0.002)
+        active.pop()
+        assert not overlapping, "load_models_gpu() called concurrently"
+        calls.append([patcher.load_device for patcher in patchers])
+    monkeypatch.setattr(comfy.model_management, "load_models_gpu", load_models_gpu)
+    return calls
+
+def pixels(count=7):
+    return torch.rand(count, 64, 96, 3, generator=torch.Generator().manual_seed(count))
+
+def test_single_device_shares_the_vae(monkeypatch, loads):
+    monkeypatch.setattr(stable_cascade_vae, "replica_devices", lambda: [])
+    vae = RecordingVAE()
+    assert stable_cascade_vae.vae_replicas(vae, 4) == [vae]
+    assert torch.equal(stable_cascade_vae.encode(vae, pixels(), 4), vae.encode(pixels()))
+    assert vae.used == [7, 7]
+
+def test_replicas_encode_one_shard_per_device(monkeypatch, loads):
+    monkeypatch.setattr(stable_cascade_vae, "replica_devices", lambda: DEVICES[:3])
+    vae = RecordingVAE(DEVICES[1])
+
+    replicas = stable_cascade_vae.vae_replicas(vae, 8)
+    assert [replica.device for replica in replicas] == [DEVICES[1], DEVICES[0], DEVICES[2]]
+    assert [replica.patcher.load_device for replica in replicas] == [DEVICES[1], DEVICES[0], DEVICES[2]]
+    # Copies are reused, and never made for the VAE's own device
+    assert stable_cascade_vae.vae_replicas(vae, 2) == replicas[:2]
+
+    latent = stable_cascade_vae.encode(vae, pixels(), 8)
+    # The replicas are loaded once, together, and never again by the encoding threads
+    assert loads == [[DEVICES[1], DEVICES[0], DEVICES[2]]]
+    assert [replica.used for replica in replicas] == [[3], [2], [2]]
+    assert torch.equal(latent, ComfyStubVAE().encode(pixels()))
+
+def test_shards_follow_the_free_memory(monkeypatch, loads):
+    monkeypatch.setattr(stable_cascade_vae, "replica_devices", lambda: DEVICES[:2])
+    monkeypatch.setattr(comfy.model_management, "get_free_memory", lambda device=None: 2 * 1767 * 64 * 96 * 4)
+    vae = RecordingVAE()
+    latent = stable_cascade_vae.encode(vae, pixels(), 2)
+    assert vae.used == [2, 2]
+    assert torch.equal(latent, ComfyStubVAE().encode(pixels()))
+
+@pytest.mark.parametrize("vae_class", [RecordingVAE, PlainVAE])
+def test_concurrent_encodes_never_load_concurrently(monkeypatch, loads, vae_class):
+    monkeypatch.setattr(stable_cascade_vae, "replica_devices", lambda: DEVICES)
+    vae = vae_class()
+    batches = [pixels(count) for count in range(1, 13)]
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        latents = list(executor.map(lambda batch: stable_cascade_vae.encode(vae, batch, 4), batches * 3))
+
+    for batch, latent in zip(batches * 3, latents):
+        assert torch.equal(latent, vae_class().encode(batch))
+    # One copy per other device however many encodes raced to create them
+    assert sorted(stable_cascade_vae._replicas[vae], key=str) == sorted(DEVICES[1:], key=str)